@@ -0,0 +1,134 @@
+"""Cubo de contagens por Mês × UF × Segmento para resumos e para o mapa em zoom baixo."""
+import numpy as np
+import pandas as pd
+
+from datas import MESES
+from filtros import separar_valores
+
+DIMENSOES = ('meses', 'ufs', 'segmentos')
+# Colunas que mudam o conteúdo do cubo; uma linha com a mesma assinatura não precisa de ser recontada
+COLUNAS_CUBO = ['evento_id', 'Mes', 'UF', 'Segmento', 'Latitude', 'Longitude']
+
+
+class CuboContagens:
+    """Contagens pré-calculadas, independentes do número de eventos depois de construídas.
+
+    `eventos[m, u]` conta eventos por mês e UF, `pares[m, u, s]` conta pares
+    evento-segmento (um evento com três segmentos conta uma vez em cada) e
+    `soma_latitude`/`soma_longitude` guardam as somas das coordenadas para o
+    centróide por UF. Qualquer combinação dos filtros de mês e de UF é respondida
+    somando fatias destes arrays. Um cubo nunca é alterado depois de construído:
+    `atualizado` devolve um novo cubo com as diferenças aplicadas.
+    """
+
+    def __init__(self, meses=(), ufs=(), segmentos=(), eventos=None, pares=None, soma_latitude=None, soma_longitude=None):
+        self.meses, self.ufs, self.segmentos = list(meses), list(ufs), list(segmentos)
+        forma = (len(self.meses), len(self.ufs))
+        self.eventos = np.zeros(forma, dtype=np.int32) if eventos is None else np.array(eventos, dtype=np.int32)
+        self.pares = np.zeros(forma + (len(self.segmentos),), dtype=np.int32) if pares is None else np.array(pares, dtype=np.int32)
+        self.soma_latitude = np.zeros(forma) if soma_latitude is None else np.array(soma_latitude, dtype=np.float64)
+        self.soma_longitude = np.zeros(forma) if soma_longitude is None else np.array(soma_longitude, dtype=np.float64)
+        self._posicoes = {dimensao: {valor: i for i, valor in enumerate(getattr(self, dimensao))} for dimensao in DIMENSOES}
+
+    @classmethod
+    def a_partir_de(cls, df):
+        cubo = cls()
+        cubo._acumular(df, 1)
+        return cubo
+
+    def atualizado(self, df_anterior, df_novo):
+        """Novo cubo para `df_novo`, recontando só as linhas que diferem de `df_anterior`."""
+        assinatura_anterior = pd.util.hash_pandas_object(df_anterior[COLUNAS_CUBO], index=False).to_numpy()
+        assinatura_nova = pd.util.hash_pandas_object(df_novo[COLUNAS_CUBO], index=False).to_numpy()
+        cubo = CuboContagens(self.meses, self.ufs, self.segmentos, self.eventos, self.pares, self.soma_latitude, self.soma_longitude)
+        cubo._acumular(df_anterior[~np.isin(assinatura_anterior, assinatura_nova)], -1)
+        cubo._acumular(df_novo[~np.isin(assinatura_nova, assinatura_anterior)], 1)
+        # Sem eventos, as somas voltam a zero em vez de acumularem erros de arredondamento
+        cubo.soma_latitude[cubo.eventos == 0] = 0.0
+        cubo.soma_longitude[cubo.eventos == 0] = 0.0
+        return cubo
+
+    def _codigos(self, dimensao, valores):
+        """Posição de cada valor na dimensão, acrescentando (e alargando os arrays) os novos."""
+        posicoes = self._posicoes[dimensao]
+        novos = [valor for valor in dict.fromkeys(valores) if valor not in posicoes]
+        if novos:
+            eixo = DIMENSOES.index(dimensao)
+            for valor in novos:
+                posicoes[valor] = len(posicoes)
+                getattr(self, dimensao).append(valor)
+            largura = [(0, 0)] * 3
+            largura[eixo] = (0, len(novos))
+            self.pares = np.pad(self.pares, largura)
+            if eixo < 2:
+                self.eventos = np.pad(self.eventos, largura[:2])
+                self.soma_latitude = np.pad(self.soma_latitude, largura[:2])
+                self.soma_longitude = np.pad(self.soma_longitude, largura[:2])
+        return np.array([posicoes[valor] for valor in valores], dtype=np.int64)
+
+    def _acumular(self, df, sinal):
+        if df.empty:
+            return
+        # Sem mês (ou UF) conta na posição '', que só aparece quando não há filtro
+        mes = self._codigos('meses', df['Mes'].fillna('').astype(str).tolist())
+        uf = self._codigos('ufs', df['UF'].fillna('').astype(str).tolist())
+        np.add.at(self.eventos, (mes, uf), sinal)
+        np.add.at(self.soma_latitude, (mes, uf), sinal * df['Latitude'].to_numpy(dtype=np.float64))
+        np.add.at(self.soma_longitude, (mes, uf), sinal * df['Longitude'].to_numpy(dtype=np.float64))
+        listas = separar_valores(df['Segmento'])
+        linha = np.repeat(np.arange(len(df)), listas.map(len).to_numpy())
+        segmento = self._codigos('segmentos', [valor for valores in listas for valor in valores])
+        np.add.at(self.pares, (mes[linha], uf[linha], segmento), sinal)
+
+    def _selecao(self, dimensao, valores):
+        """Posições a somar numa dimensão; sem valores, todas."""
+        if not valores:
+            return np.arange(len(getattr(self, dimensao)))
+        posicoes = self._posicoes[dimensao]
+        return np.array([posicoes[valor] for valor in valores if valor in posicoes], dtype=np.int64)
+
+    def _fatia(self, array, meses, ufs):
+        return array[np.ix_(self._selecao('meses', meses), self._selecao('ufs', ufs))]
+
+    def total(self, meses=(), ufs=()):
+        return int(self._fatia(self.eventos, meses, ufs).sum())
+
+    def por_mes_uf(self, meses=(), ufs=()):
+        """Eventos por mês (linhas, pela ordem do calendário) e UF (colunas), sem linhas ou colunas vazias."""
+        linhas = [self.meses[i] for i in self._selecao('meses', meses)]
+        colunas = [self.ufs[i] for i in self._selecao('ufs', ufs)]
+        tabela = pd.DataFrame(self._fatia(self.eventos, meses, ufs), index=linhas, columns=colunas)
+        tabela = tabela.loc[tabela.sum(axis=1) > 0, tabela.sum(axis=0) > 0]
+        ordem = {mes: i for i, mes in enumerate(MESES)}
+        tabela = tabela.loc[sorted(tabela.index, key=lambda mes: ordem.get(mes, len(MESES))), sorted(tabela.columns)]
+        return tabela.rename(index={'': 'Sem mês'}, columns={'': 'Sem UF'})
+
+    def top_segmentos(self, meses=(), ufs=(), n=10):
+        """Segmentos com mais eventos na seleção, por ordem decrescente."""
+        contagens = self._fatia(self.pares, meses, ufs).sum(axis=(0, 1))
+        serie = pd.Series(contagens, index=self.segmentos, dtype=np.int64)
+        return serie[serie > 0].sort_values(ascending=False, kind='stable').head(n)
+
+    def agregados_uf(self, meses=(), ufs=()):
+        """Mesmo formato que `mapa.agregar_eventos(df, 'UF')`: UF, quantidade e centróide dos pontos."""
+        quantidade = self._fatia(self.eventos, meses, ufs).sum(axis=0)
+        latitude = self._fatia(self.soma_latitude, meses, ufs).sum(axis=0)
+        longitude = self._fatia(self.soma_longitude, meses, ufs).sum(axis=0)
+        agregados = pd.DataFrame({
+            'UF': [self.ufs[i] for i in self._selecao('ufs', ufs)], 'quantidade': quantidade,
+            'Latitude': latitude / np.maximum(quantidade, 1), 'Longitude': longitude / np.maximum(quantidade, 1),
+        })
+        return agregados[agregados['quantidade'] > 0].reset_index(drop=True)
+
+    def memoria_bytes(self):
+        return sum(array.nbytes for array in (self.eventos, self.pares, self.soma_latitude, self.soma_longitude))
+
+    def para_arrays(self):
+        return {
+            'meses': self.meses, 'ufs': self.ufs, 'segmentos': self.segmentos, 'eventos': self.eventos,
+            'pares': self.pares, 'soma_latitude': self.soma_latitude, 'soma_longitude': self.soma_longitude,
+        }
+
+    @classmethod
+    def de_arrays(cls, arrays):
+        return cls(**arrays)
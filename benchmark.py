@@ -0,0 +1,334 @@
+"""Benchmark sem browser das fases do dashboard sobre catálogos sintéticos.
+
+Para cada tamanho de catálogo gera um ficheiro de eventos (cidades reais do
+gazetteer e uma parte de cidades fictícias, que vão para um geocodificador
+simulado em vez do Nominatim) e expositores para algumas feiras. Depois mede o
+tempo (mediana de `--repeticoes`) e o pico de memória (tracemalloc, numa execução
+à parte) de cada fase:
+
+    carregar        leitura e limpeza do catálogo (CatalogoEventos)
+    geocodificar    gazetteer + trabalho de geocodificação (como no dashboard) com
+                    o geocodificador simulado e a cache SQLite
+    indices         DatasetPreparado (índices de datas, filtros e espacial)
+    filtrar         combinações de filtros com `DatasetPreparado.filtrar`, como no dashboard
+    resumo          resumos por mês, UF e segmento a partir do cubo de contagens
+    expositores     contagem, páginas e tabela dos expositores de cada feira
+    mapa_camada     camada de eventos e camada agregada por UF
+    mapa_render     HTML do mapa com a camada de eventos
+
+Os resultados vão para `--saida` (JSON). Com `--gravar-baseline` passam a ser a
+referência; sem ele, são comparados com a referência e o programa termina com
+código 1 se alguma fase piorar mais do que `--limiar` (ou 2 se não houver uma
+referência comparável):
+
+    python benchmark.py --gravar-baseline
+    python benchmark.py --tamanhos 100,10000 --limiar 0.3
+"""
+import argparse
+import csv
+import gc
+import hashlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from dataset import DatasetPreparado
+from datas import MESES
+from expositores import ExpositoresStore
+from filtros import nomes_para_selecao
+from gazetteer import DIRETORIO_DADOS, Coordenadas, Gazetteer
+from geocodificacao import GeocodeCache, GeocodificacaoEmFundo, geocodificar_dataframe
+from ingestao import CatalogoEventos
+from mapa import LIMITE_AGRUPAMENTO, ZOOM_BRASIL, camada_eventos, camada_viewport, criar_mapa_base
+
+DIRETORIO_BASE = os.path.dirname(os.path.abspath(__file__))
+CAMINHO_BASELINE = os.path.join(DIRETORIO_BASE, "benchmark_baseline.json")
+CAMINHO_RESULTADOS = os.path.join(DIRETORIO_BASE, ".cache", "benchmark", "resultados.json")
+TAMANHOS = (100, 10_000, 100_000)
+FORMATO = 1
+# Diferenças abaixo destes valores são ruído, mesmo que ultrapassem o limiar relativo
+MINIMO_SEGUNDOS = 0.05
+MINIMO_MB = 5.0
+REPETICOES = 7
+
+SEGMENTOS = [
+    "Agronegócio", "Tecnologia", "Pecuária", "Agricultura Familiar", "Máquinas", "Fruticultura",
+    "Fertilizantes", "Café", "Aquicultura", "Avicultura", "Suinocultura", "Florestal",
+]
+# Fração de eventos em cidades que o gazetteer não conhece
+FRACAO_CIDADES_FICTICIAS = 0.05
+
+
+class GeocodificadorSimulado:
+    """Substituto offline do Nominatim: coordenadas determinísticas dentro do Brasil."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.consultas = 0
+
+    def geocode(self, localizacao, timeout=None):
+        self.consultas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        semente = int(hashlib.sha1(localizacao.encode("utf-8")).hexdigest()[:8], 16)
+        return Coordenadas(-30 + (semente % 2500) / 100, -70 + (semente // 2500 % 3500) / 100)
+
+
+def gerar_catalogo(caminho, total, semente=0):
+    """Escreve um CSV de eventos no formato de dados/eventos com `total` linhas."""
+    aleatorio = random.Random(semente)
+    with open(os.path.join(DIRETORIO_DADOS, "municipios.csv"), encoding="utf-8", newline="") as ficheiro:
+        municipios = [(linha["nome"], linha["uf"]) for linha in csv.DictReader(ficheiro)]
+    ufs = sorted({uf for _, uf in municipios})
+    with open(caminho, "w", encoding="utf-8", newline="") as ficheiro:
+        escritor = csv.writer(ficheiro)
+        escritor.writerow(["Mês", "Evento", "Foco", "Data", "Cidade", "UF"])
+        for indice in range(total):
+            if aleatorio.random() < FRACAO_CIDADES_FICTICIAS:
+                cidade, uf = f"Vila Sintética {aleatorio.randrange(total // 20 + 1)}", aleatorio.choice(ufs)
+            else:
+                cidade, uf = aleatorio.choice(municipios)
+            dia = aleatorio.randint(1, 26)
+            datas = aleatorio.choice([f"{dia:02d} a {dia + 2:02d}", f"{dia:02d} e {dia + 1:02d}", f"{dia:02d}", ""])
+            escritor.writerow([
+                aleatorio.choice(MESES),
+                f"Feira Sintética {indice} {aleatorio.choice([2025, 2026])}",
+                ", ".join(aleatorio.sample(SEGMENTOS, aleatorio.randint(1, 3))),
+                datas, cidade, uf,
+            ])
+
+
+def gerar_expositores(caminho, nomes_eventos, por_feira, semente=0):
+    """Escreve um JSON de expositores (formato de dados/expositores) para as feiras dadas."""
+    aleatorio = random.Random(semente)
+    dados = {
+        evento: [
+            {
+                "nome": f"Expositor {indice:05d} {aleatorio.choice(['Agro', 'Máquinas', 'Sementes', 'Nutrição'])} Ltda",
+                "segmento": aleatorio.sample(SEGMENTOS, aleatorio.randint(1, 2)),
+                "descricao": "Empresa sintética para benchmark.",
+            }
+            for indice in range(por_feira)
+        ]
+        for evento in nomes_eventos
+    }
+    with open(caminho, "w", encoding="utf-8") as ficheiro:
+        json.dump(dados, ficheiro, ensure_ascii=False)
+
+
+def medir(funcao, repeticoes):
+    """(mediana em s, pico de memória em MB, resultado) de `funcao()`."""
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(tempos), pico / 1024 ** 2, resultado
+
+
+def filtrar(dataset, consultas):
+    """O que o main_dashboard faz a cada rerun: linhas filtradas e nomes para a seleção."""
+    total = 0
+    for consulta in consultas:
+        df_filtrado = dataset.filtrar(*consulta)
+        nomes_para_selecao(df_filtrado)
+        total += len(df_filtrado)
+    return total
+
+
+def consultas_filtro(dataset):
+    motor = dataset.motor_filtros
+    ufs = motor.valores('UF')
+    return [
+        ({},),
+        ({'Mes': ['Setembro']},),
+        ({'UF': ufs[:3]},),
+        ({'Segmento': ['Tecnologia']},),
+        ({'Mes': ['Março', 'Abril'], 'UF': ['SP', 'MG', 'PR'], 'Segmento': ['Pecuária', 'Café']},),
+        ({}, (pd.Timestamp('2026-03-01').date(), pd.Timestamp('2026-03-31').date())),
+        ({'Segmento': ['Agronegócio']}, (), (-23.55, -46.63), 300),
+        ({}, (), (-15.79, -47.88), None, 20),
+    ]
+
+
+def resumir(cubo):
+    """As consultas do resumo e do mapa por UF para várias seleções de mês e UF."""
+    for meses, ufs in (((), ()), (('Setembro',), ()), ((), ('SP', 'MG', 'PR')), (('Março', 'Abril'), ('RS',))):
+        cubo.total(meses, ufs)
+        cubo.por_mes_uf(meses, ufs)
+        cubo.top_segmentos(meses, ufs)
+        cubo.agregados_uf(meses, ufs)
+
+
+def mostrar_expositores(store, eventos, por_pagina=100):
+    """O que o painel de expositores faz por feira: segmentos, contagens e duas páginas."""
+    linhas = 0
+    for evento_id in eventos:
+        segmentos = store.segmentos(evento_id)
+        for pesquisa, segmento in ((None, None), ("agro", None), (None, segmentos[0] if segmentos else None)):
+            total = store.contar(evento_id, pesquisa, segmento)
+            for deslocamento in (0, max(0, total // 2 // por_pagina * por_pagina)):
+                pagina = store.listar(evento_id, pesquisa, segmento, por_pagina, deslocamento)
+                tabela = pd.DataFrame({
+                    'Expositor': [expositor['nome'] for expositor in pagina],
+                    'Segmentos': [', '.join(expositor['segmento']) for expositor in pagina],
+                })
+                linhas += len(tabela)
+    return linhas
+
+
+def correr_tamanho(total, opcoes, gazetteer, pasta):
+    """Mede todas as fases para um catálogo de `total` eventos; devolve {fase: {tempo_s, pico_mb}}."""
+    diretorio_eventos = os.path.join(pasta, f"eventos_{total}")
+    os.makedirs(diretorio_eventos)
+    gerar_catalogo(os.path.join(diretorio_eventos, "eventos.csv"), total, opcoes.semente)
+    resultados = {}
+
+    def registar(fase, medicao):
+        resultados[fase] = {'tempo_s': round(medicao[0], 6), 'pico_mb': round(medicao[1], 3)}
+        print(f"  {fase:<14} {1000 * medicao[0]:>10.1f} ms {medicao[1]:>10.1f} MB", flush=True)
+        return medicao[2]
+
+    catalogo = registar('carregar', medir(lambda: CatalogoEventos(diretorio_eventos).atualizar(), opcoes.repeticoes))
+
+    geolocator = GeocodificadorSimulado(opcoes.latencia)
+
+    def geocodificar():
+        df = catalogo.copy()
+        # Cache nova em cada execução: mede-se o caminho completo, não só acertos na cache
+        cache = GeocodeCache(os.path.join(tempfile.mkdtemp(dir=pasta), "geocode.sqlite"))
+
+        def remoto(pendentes):
+            # O dashboard deixa o trabalho em segundo plano; aqui espera-se que termine
+            return GeocodificacaoEmFundo(geolocator, cache, taxa=1e9).pedir(pendentes).aguardar().resultados()
+
+        geocodificar_dataframe(df, gazetteer, remoto, cache)
+        return df.dropna(subset=['Latitude', 'Longitude'])
+
+    df = registar('geocodificar', medir(geocodificar, opcoes.repeticoes))
+    dataset = registar('indices', medir(lambda: DatasetPreparado(df), opcoes.repeticoes))
+    consultas = consultas_filtro(dataset)
+    registar('filtrar', medir(lambda: filtrar(dataset, consultas), opcoes.repeticoes))
+    registar('resumo', medir(lambda: resumir(dataset.cubo), opcoes.repeticoes))
+
+    feiras = dataset.df.drop_duplicates('Nome').head(opcoes.feiras_com_expositores)
+    diretorio_expositores = os.path.join(pasta, f"expositores_{total}")
+    os.makedirs(diretorio_expositores)
+    gerar_expositores(os.path.join(diretorio_expositores, "expositores.json"), feiras['Nome'], opcoes.expositores_por_feira, opcoes.semente)
+    store = ExpositoresStore(os.path.join(pasta, f"expositores_{total}.sqlite"))
+    store.importar_diretorio(diretorio_expositores)
+    store.associar_eventos(dict(zip(feiras['Nome'], feiras['evento_id'])))
+    registar('expositores', medir(lambda: mostrar_expositores(store, feiras['evento_id']), opcoes.repeticoes))
+
+    agrupar = len(dataset.df) > LIMITE_AGRUPAMENTO
+
+    def construir_camadas():
+        return camada_eventos(dataset.df, agrupar), camada_viewport(dataset.df, None, ZOOM_BRASIL)[0]
+
+    camada, _ = registar('mapa_camada', medir(construir_camadas, opcoes.repeticoes))
+
+    def renderizar():
+        mapa = criar_mapa_base()
+        camada.add_to(mapa)
+        return len(mapa.get_root().render())
+
+    registar('mapa_render', medir(renderizar, opcoes.repeticoes))
+    return resultados
+
+
+def comparar(resultados, baseline, limiar):
+    """Lista de regressões (tamanho, fase, métrica, base, atual) acima de `limiar` (fração)."""
+    regressoes = []
+    for tamanho, fases in resultados.items():
+        for fase, valores in fases.items():
+            base = baseline.get(tamanho, {}).get(fase)
+            if base is None:
+                continue
+            for metrica, minimo in (('tempo_s', MINIMO_SEGUNDOS), ('pico_mb', MINIMO_MB)):
+                atual, referencia = valores[metrica], base[metrica]
+                if atual > referencia * (1 + limiar) and atual - referencia > minimo:
+                    regressoes.append((tamanho, fase, metrica, referencia, atual))
+    return regressoes
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", default=",".join(map(str, TAMANHOS)), help="números de eventos, separados por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--feiras-com-expositores", type=int, default=10)
+    parser.add_argument("--expositores-por-feira", type=int, default=1200)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por consulta ao geocodificador simulado")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", default=CAMINHO_RESULTADOS)
+    parser.add_argument("--baseline", default=CAMINHO_BASELINE)
+    parser.add_argument("--gravar-baseline", action="store_true", help="gravar os resultados como nova referência")
+    parser.add_argument("--limiar", type=float, default=0.25, help="piora relativa tolerada (0.25 = 25%%)")
+    opcoes = parser.parse_args(argumentos)
+
+    gazetteer = Gazetteer()
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as pasta:
+        for total in (int(valor) for valor in opcoes.tamanhos.split(",")):
+            print(f"{total} eventos", flush=True)
+            resultados[str(total)] = correr_tamanho(total, opcoes, gazetteer, pasta)
+
+    documento = {
+        'formato': FORMATO,
+        'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'parametros': {
+            'repeticoes': opcoes.repeticoes, 'feiras_com_expositores': opcoes.feiras_com_expositores,
+            'expositores_por_feira': opcoes.expositores_por_feira, 'latencia': opcoes.latencia, 'semente': opcoes.semente,
+        },
+        'resultados': resultados,
+    }
+    os.makedirs(os.path.dirname(opcoes.saida) or ".", exist_ok=True)
+    with open(opcoes.saida, "w", encoding="utf-8") as ficheiro:
+        json.dump(documento, ficheiro, ensure_ascii=False, indent=2)
+    if opcoes.gravar_baseline:
+        with open(opcoes.baseline, "w", encoding="utf-8") as ficheiro:
+            json.dump(documento, ficheiro, ensure_ascii=False, indent=2)
+        print(f"Referência gravada em {opcoes.baseline}")
+        return 0
+
+    try:
+        with open(opcoes.baseline, encoding="utf-8") as ficheiro:
+            baseline = json.load(ficheiro)
+    except FileNotFoundError:
+        # Sem referência nada é verificado: não pode passar como "sem regressões"
+        print(f"Sem referência em {opcoes.baseline}; use --gravar-baseline para a criar.", file=sys.stderr)
+        return 2
+    # As repetições só afinam a mediana; o resto muda o trabalho medido
+    comparaveis = {chave: valor for chave, valor in documento['parametros'].items() if chave != 'repeticoes'}
+    if baseline.get('formato') != FORMATO or any(baseline['parametros'].get(chave) != valor for chave, valor in comparaveis.items()):
+        print("A referência foi gravada com outro formato ou parâmetros; não é comparável.", file=sys.stderr)
+        return 2
+    regressoes = comparar(resultados, baseline['resultados'], opcoes.limiar)
+    for tamanho, fase, metrica, referencia, atual in regressoes:
+        print(f"REGRESSÃO {tamanho} eventos / {fase} / {metrica}: {referencia:g} -> {atual:g} (+{atual / referencia - 1:.0%})")
+    if regressoes:
+        return 1
+    print(f"Sem regressões acima de {opcoes.limiar:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
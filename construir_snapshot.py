@@ -0,0 +1,54 @@
+"""Constrói o snapshot do dataset fora do dashboard.
+
+Corre a mesma preparação que o dashboard faz no arranque (leitura e limpeza de
+dados/eventos, gazetteer e, para o que faltar, Nominatim com a cache SQLite) e
+grava o resultado com `snapshot.escrever_snapshot`. Pensado para correr em CI ou
+num cron sempre que os ficheiros de eventos mudam:
+
+    python construir_snapshot.py [--sem-nominatim] [--eventos DIR] [--destino DIR]
+"""
+import argparse
+import os
+import sys
+import time
+
+from gazetteer import Gazetteer
+from geocodificacao import GeocodeCache, geocodificar_dataframe, geocodificar_localizacoes
+from ingestao import DIRETORIO_EVENTOS, CatalogoEventos
+from snapshot import DIRETORIO_SNAPSHOT, escrever_snapshot
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--eventos", default=DIRETORIO_EVENTOS, help="diretório dos ficheiros de eventos")
+    parser.add_argument("--destino", default=DIRETORIO_SNAPSHOT, help="diretório dos snapshots")
+    parser.add_argument("--sem-nominatim", action="store_true", help="usar só o gazetteer offline")
+    parser.add_argument("--taxa", type=float, default=float(os.environ.get("DASHBOARD_NOMINATIM_TAXA", "1.0")))
+    opcoes = parser.parse_args(argumentos)
+
+    inicio = time.perf_counter()
+    catalogo = CatalogoEventos(opcoes.eventos)
+    fontes = catalogo.hashes()
+    df = catalogo.atualizar()
+    for origem, erro in catalogo.erros.items():
+        print(f"Aviso: {origem} ignorado ({erro})", file=sys.stderr)
+    remoto = cache = None
+    if not opcoes.sem_nominatim:
+        from geopy.geocoders import Nominatim
+
+        geolocator = Nominatim(user_agent="studio-data-dashboard-v14")
+        cache = GeocodeCache()
+        cache.limpar_expirados()
+        # Aqui não há pressa: espera-se pelo Nominatim em vez de o deixar em segundo plano
+        remoto = lambda pendentes: geocodificar_localizacoes(pendentes, geolocator, cache, taxa=opcoes.taxa)
+    nao_resolvidas = geocodificar_dataframe(df, Gazetteer(), remoto, cache)
+    manifesto = escrever_snapshot(df, fontes, catalogo.erros, nao_resolvidas, opcoes.destino)
+    print(
+        f"Snapshot {manifesto['versao']}: {manifesto['eventos']} eventos de {len(fontes)} ficheiro(s), "
+        f"{len(nao_resolvidas)} localização(ões) por resolver, em {time.perf_counter() - inicio:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
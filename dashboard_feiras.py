@@ -1,11 +1,36 @@
 import pandas as pd
 import streamlit as st
-import folium
 from streamlit_folium import st_folium
 from geopy.geocoders import Nominatim
-import io
+import os
+import math
 import time
 
+import metricas
+from agregados import CuboContagens
+from dataset import DatasetCompartilhado
+from datas import MESES
+from expositores import ExpositoresStore
+from filtros import nomes_para_selecao
+from gazetteer import Gazetteer
+from geocodificacao import ESTADO_FALHA, ESTADO_NAO_ENCONTRADO, GeocodeCache, GeocodificacaoEmFundo, geocodificar_dataframe
+from ingestao import CatalogoEventos
+from mapa import (
+    CENTRO_BRASIL, LIMITE_AGRUPAMENTO, ZOOM_BRASIL, ZOOM_EVENTO, ZOOM_MAXIMO_UF,
+    camada_de_dados, camada_selecao, criar_mapa_base, dados_eventos, dados_viewport, limites_viewport, medir_dados,
+)
+from snapshot import carregar_snapshot
+
+# O Nominatim só é consultado para o que o gazetteer offline não resolve
+USAR_NOMINATIM = os.environ.get("DASHBOARD_NOMINATIM", "1") != "0"
+EXPOSITORES_POR_PAGINA = 100
+# Intervalo mínimo, por sessão, entre verificações de alterações em dados/eventos
+INTERVALO_VERIFICACAO_CATALOGO = 30
+# Política do Nominatim: no máximo 1 pedido por segundo
+NOMINATIM_TAXA = float(os.environ.get("DASHBOARD_NOMINATIM_TAXA", "1.0"))
+# Um trabalho de geocodificação que terminou com falhas é refeito depois deste intervalo
+INTERVALO_NOVA_TENTATIVA = 15 * 60
+
 # --- CONFIGURAÇÃO DA PÁGINA E ESTILOS ---
 st.set_page_config(
     layout="wide",
@@ -52,166 +77,210 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 
-# --- BASE DE DADOS DOS EXPOSITORES ---
-expositores_db = {
-    "Congresso Andav 2025": [
-        {'nome': 'ADAMA', 'segmento': ['Agroquímicos'], 'descricao': 'Líder global em proteção de cultivos, fornecendo soluções para agricultores em todo o mundo.'},
-        {'nome': 'BASF', 'segmento': ['Agroquímicos', 'Sementes'], 'descricao': 'Empresa química líder mundial, com um vasto portfólio para agricultura, incluindo sementes e defensivos.'},
-        {'nome': 'BAYER', 'segmento': ['Agroquímicos', 'Biológicos'], 'descricao': 'Gigante farmacêutica e agrícola, focada em saúde e nutrição, com forte presença em proteção de cultivos.'},
-        {'nome': 'CORTEVA', 'segmento': ['Agroquímicos', 'Sementes'], 'descricao': 'Empresa puramente agrícola, com forte herança da Dow e DuPont, focada em sementes e proteção de cultivos.'},
-        {'nome': 'FMC', 'segmento': ['Agroquímicos'], 'descricao': 'Empresa de ciências agrícolas que avança a agricultura com soluções inovadoras e sustentáveis.'},
-        {'nome': 'SYNGENTA', 'segmento': ['Agroquímicos', 'Sementes'], 'descricao': 'Líder em agricultura, ajudando a melhorar a segurança alimentar global, permitindo que milhões de agricultores façam melhor uso dos recursos disponíveis.'},
-        {'nome': 'YARA', 'segmento': ['Adubos/Fertilizantes'], 'descricao': 'Líder mundial em nutrição de plantas, oferecendo soluções para agricultura sustentável e meio ambiente.'},
-        {'nome': 'JACTO', 'segmento': ['Máquinas/Equipamentos'], 'descricao': 'Empresa brasileira, líder em pulverizadores e equipamentos agrícolas, com presença em mais de 100 países.'}
-    ],
-    "Victam Latam 2025": [
-        {'nome': '4B', 'segmento': ['Equipamentos'], 'descricao': 'Líder em componentes para elevadores de canecas e transportadores, e monitoramento de risco de explosão.'},
-        {'nome': 'Andritz', 'segmento': ['Equipamentos', 'Tecnologia'], 'descricao': 'Grupo tecnológico internacional que fornece plantas, sistemas e serviços para várias indústrias, incluindo nutrição animal.'},
-        {'nome': 'Awila', 'segmento': ['Equipamentos'], 'descricao': 'Especialista em plantas de ração mista, manuseio de grãos e moagem industrial.'},
-        {'nome': 'Buhler', 'segmento': ['Equipamentos', 'Tecnologia'], 'descricao': 'Líder em tecnologia para processamento de alimentos e mobilidade, com soluções para toda a cadeia de valor.'},
-        {'nome': 'CPM', 'segmento': ['Equipamentos'], 'descricao': 'Fornecedor líder de equipamentos de processo para as indústrias de nutrição animal, oleaginosas e biocombustíveis.'},
-        {'nome': 'Dinnissen', 'segmento': ['Equipamentos'], 'descricao': 'Especialista em desenvolvimento de máquinas, instalações completas e processos para a indústria de alimentos e rações.'},
-        {'nome': 'Emate', 'segmento': ['Equipamentos'], 'descricao': 'Fornecedor de soluções completas para a indústria de rações, incluindo moinhos de martelos e misturadores.'},
-        {'nome': 'Famsun', 'segmento': ['Equipamentos', 'Tecnologia'], 'descricao': 'Provedor de soluções integradas para a indústria agroalimentar, com foco em ração, armazenamento e processamento.'},
-        {'nome': 'Ferraz', 'segmento': ['Máquinas/Equipamentos'], 'descricao': 'Fabricante brasileiro de máquinas e equipamentos para nutrição animal.'},
-        {'nome': 'Forberg', 'segmento': ['Equipamentos'], 'descricao': 'Inventor do misturador de pás duplas, fornecendo tecnologia de mistura para diversas indústrias.'},
-        {'nome': 'Frigm', 'segmento': ['Equipamentos'], 'descricao': 'Descrição não disponível.'},
-        {'nome': 'Goudsmit', 'segmento': ['Equipamentos'], 'descricao': 'Especialista em sistemas magnéticos para separação, transporte e reciclagem de metais.'},
-        {'nome': 'Kahl', 'segmento': ['Equipamentos'], 'descricao': 'Fabricante de prensas peletizadoras e outras máquinas para a indústria de rações e alimentos.'},
-        {'nome': 'Mabra', 'segmento': ['Equipamentos'], 'descricao': 'Empresa especializada em equipamentos para a indústria de nutrição animal.'},
-        {'nome': 'PLP', 'segmento': ['Equipamentos'], 'descricao': 'Fornecedor de sistemas de aplicação de líquidos e pós para a indústria de rações.'},
-        {'nome': 'Polypack', 'segmento': ['Embalagens'], 'descricao': 'Líder em soluções de embalagens, incluindo sacos e filmes para a indústria agro.'},
-        {'nome': 'Rosal', 'segmento': ['Equipamentos'], 'descricao': 'Fabricante de moinhos de martelos e soluções para moagem e processamento.'},
-        {'nome': 'Silos', 'segmento': ['Armazenagem'], 'descricao': 'Descrição não disponível.'},
-        {'nome': 'TSE', 'segmento': ['Equipamentos'], 'descricao': 'Descrição não disponível.'},
-        {'nome': 'Van Aarsen', 'segmento': ['Equipamentos', 'Tecnologia'], 'descricao': 'Desenvolve e fabrica máquinas e soluções completas para a indústria de ração animal.'},
-        {'nome': 'Wemenger', 'segmento': ['Equipamentos'], 'descricao': 'Descrição não disponível.'},
-        {'nome': 'Zheng', 'segmento': ['Equipamentos'], 'descricao': 'Descrição não disponível.'}
-    ]
-}
-
 # --- FUNÇÕES DE PROCESSAMENTO ---
-@st.cache_data
+@st.cache_resource
+def obter_registo_metricas():
+    return metricas.RegistoMetricas()
+
+@st.cache_resource
+def obter_catalogo():
+    return CatalogoEventos()
+
 def carregar_e_limpar_dados():
-    dados_string = """Mês,Evento,Foco,Data,Cidade,UF
-Janeiro,AgroShow Copagril 2026,Agronegócio,14 a 16,Marechal Cândido Rondon,PR
-Janeiro,COOLACER 2026,Tecnologia,28 e 29,Lacerdópolis,SC
-Janeiro,Dinetec,Tecnologia,,Canarana,MT
-Janeiro,Fertilizer Latino Americano,Fertilizantes,,Rio de Janeiro,RJ
-Fevereiro,Sealba Show 2026,Agronegócio,04 a 07,Itabaiana,SE
-Fevereiro,Show Safra BR 163,Tecnologia,18 a 21,Lucas do Rio Verde,MT
-Fevereiro,Show Tecnológico de Verão,Tecnologia,20 a 22,Ponta Grossa,PR
-Fevereiro,Copla Campo,Agronegócio,21 a 23,Piracicaba,SP
-Fevereiro,Show Rural Coopavel,Tecnologia,,"Cascavel",PR
-Março,Expodireto Cotrijal,Agronegócio,03 a 07,Não-Me-Toque,RS
-Março,Expo-Uva,Fruticultura,06 a 09,Jundiaí,SP
-Março,Farm Show,Tecnologia,11 a 14,Primavera do Leste,MT
-Março,Show Safra,Tecnologia,18 a 21,Lucas do Rio Verde,MT
-Março,Força Campo,Agronegócio,20 e 21,Arapoti,PR
-Março,Super Campo,Agronegócio,21 a 23,Londrina,PR
-Abril,Tecnoshow Comigo,Tecnologia,07 a 11,Rio Verde,GO
-Abril,ExpoLondrina,Pecuária,04 a 14,Londrina,PR
-Abril,Norte Show,Agronegócio,16 a 19,Sinop,MT
-Abril,Digital Agro,Tecnologia,23 e 24,Carambeí,PR
-Abril,Agrishow,Tecnologia,28 a 03/05,Ribeirão Preto,SP
-Maio,AgroBrasília,Agronegócio,20 a 24,Brasília,DF
-Maio,Bahia Farm Show,Tecnologia,10 a 14,Luís Eduardo Magalhães,BA
-Maio,Expointer,Pecuária,24 a 01/09,Esteio,RS
-Junho,Hortitec,Horticultura,19 a 21,Holambra,SP
-Julho,Feacoop,Cooperativismo,29 a 01/08,Bebedouro,SP
-Julho,Expomontes 2025,Feiras Agro,02 a 11 de julho,Montes Claros,MG
-Julho,Fenagen,Genética,02 a 06 de julho,Pelotas,RS
-Julho,Agripesi 2025,Agronegócio,03 a 06 de julho,São Gabriel do Oeste,MT
-Julho,Conferência Anual ABRAVEQ 2025,Veterinária,03 a 06 de julho,Rio Grande do Sul,RS
-Julho,EXPOVALE 2025,Feiras Agro,03 a 06 de julho,Mato Grosso,MT
-Julho,ACRICORTE 2025,Feiras Agro,10 e 11 de julho,Cuiabá,MT
-Julho,95ª Semana do Fazendeiro da UFV,Geral,12 a 18 de julho,Viçosa,MG
-Julho,Enflor Garden Fair 2025,Flores e Jardinagem,13 a 15 de julho,Holambra,SP
-Julho,Meeting Up Herb 2025,Plantas Daninhas,15 a 17 de julho,Passo Fundo,RS
-Julho,Superleite 2025,Pecuária Leiteira,15 a 18 de julho,Pompéu,MG
-Julho,IV Feira da Agricultura Familiar do Ceará 2025,"Agricultura Familiar, Agroecologia",17 a 19 de julho,Mucambo,CE
-Julho,EXPOBEL 2025,Pecuária e Agricultura,18 a 27 de julho,Bela Vista,MS
-Julho,CBSoja e Mercosoja 2025,"Soja (Cadeia Produtiva)",21 a 24 de julho,Campinas,SP
-Julho,TECNOALTA 2025,"Tecnologia Agrícola, Máquinas",23 a 26 de julho,Alta Floresta,MT
-Julho,Bom Jesus Agrotec Show 2025,"Tecnologia Agrícola, Negócios",23 a 26 de julho,Bom Jesus,PI
-Julho,BATATEC 2025,"Batata-doce (Cadeia Produtiva)",24 a 27 de julho,Presidente Prudente,SP
-Julho,AGROCHAPADA 2025,Pecuária e Agricultura,25 a 27 de julho,Chapada Gaúcha,MG
-Julho,Congresso da Sober 2025,"Economia, Administração e Sociologia Rural",27 a 31 de julho,Passo Fundo,RS
-Julho,Biocontrol & Biostimulants LATAM 2025,Biológicos,28 de julho,São Paulo,SP
-Julho,Bioeconomy Amazon Summit 2025,"Bioeconomia, Inovação, Amazônia",30 a 31 de julho,Manaus,AM
-Julho,"Rota do Café: Sabores, Saberes e Serras do Ceará",Cafeicultura,30 de julho,Ceará,CE
-Julho,Comdor 2025,"Saúde Animal (Dor e Anestesiologia)",31 de julho a 02 de agosto,Campinas,SP
-Agosto,18ª Feira de Sementes Crioulas e Produtos Agroecológicos,"Sementes Crioulas, Agroecologia",01 a 03 de agosto,Juti,MS
-Agosto,Congresso Brasileiro de Fitopatologia 2025,"Fitopatologia, Sanidade Vegetal",03 a 08 de agosto,Lavras,MG
-Agosto,Congresso Brasileiro de Fruticultura 2025,Fruticultura,04 a 08 de agosto,Campinas,SP
-Agosto,EXPOSUL 2025,Pecuária e Agricultura,04 a 09 de agosto,Rondonópolis,MT
-Agosto,Congresso Andav 2025,Distribuição de Insumos,05 a 07 de agosto,São Paulo,SP
-Agosto,Agro Leite 2025,Pecuária Leiteira,05 a 08 de agosto,Castro,PR
-Agosto,The Brazil Conference & Expo (IFPA),"Frutas, Flores, Legumes e Verduras (FFLV)",06 e 07 de agosto,São Paulo,SP
-Agosto,Congresso Brasileiro do Agronegócio 2025,Política e Economia do Agronegócio,11 de agosto,São Paulo,SP
-Agosto,Agro Ponte 2025,Agronegócio,13 a 17 de agosto,Criciúma,SC
-Agosto,Congresso de Aviação Agrícola 2025,Aviação Agrícola,19 a 21 de agosto,Santo Antônio do Leverger,MT
-Agosto,Expointer 2025,"Pecuária, Máquinas, Agricultura Familiar",30 de agosto a 07 de setembro,Esteio,RS
-Agosto,56ª EXPOFAC,Feiras Agro,30 de agosto a 07 de setembro,Parauapebas,PA
-Setembro,Congresso Brasileiro de Melhoramento de Plantas 2025,Melhoramento de Plantas,02 a 05 de setembro,Luís Correia,PI
-Setembro,IFC Brasil 2025,Congressos Internacionais,02 a 04 de setembro,Foz do Iguaçu,PR
-Setembro,15ª edição do Citros de Mesa,Fruticultura,04 e 05 de setembro,Cordeirópolis,SP
-Setembro,SIM - Expominas BH,Indústria,09 a 12 de setembro,Belo Horizonte,MG
-Setembro,II Simpósio Soja Max,Soja,10 e 11 de setembro,Londrina,PR
-Setembro,Agrotech Expo 2025,Tecnologia,10 a 14 de setembro,São José dos Campos,SP
-Setembro,Congresso Paranaense de Zootecnia 2025,Zootecnia,10 a 13 de setembro,Paraná,PR
-Setembro,SICONBIOL 2025,"Controle Biológico, Bioinsumos",14 a 18 de setembro,Gramado,RS
-Setembro,Conferência Bienal WDA–LA 2025,Saúde Animal,15 de setembro,Minas Gerais,MG
-Setembro,Victam Latam 2025,Rações e Grãos,16 a 18 de setembro,São Paulo,SP
-Setembro,Fórum Pecuária Brasil 2025,Pecuária (Estratégia e Mercado),17 de setembro,São Paulo,SP
-Setembro,III SIMPOHERBI 2025,Controle de Plantas Daninhas,24 a 26 de setembro,Jaboticabal,SP
-Setembro,WSAVA World Congress 2025,Medicina Veterinária (Pequenos Animais),25 a 27 de setembro,Rio de Janeiro,RJ
-Setembro,Encontro Abelheiro 2025,Apicultura,26 a 28 de setembro,Carazinho,RS
-Setembro,Semana Agronômica MS 2025,Agronomia,29 de setembro a 04 de outubro,Aquidauana,MS
-Outubro,Rio + Agro,Tecnologia,01 a 03 de outubro,Rio de Janeiro,RJ
-Outubro,ZOOTEC 2025,Zootecnia,07 a 10 de outubro,Salvador,BA
-Outubro,Congresso Brasileiro de Agronomia (CBA) 2025,Agronomia,14 a 17 de outubro,Maceió,AL
-Outubro,FENASAN 2025,Saneamento e Meio Ambiente,21 a 23 de outubro,São Paulo,SP
-Outubro,Congresso Nacional das Mulheres do Agronegócio (CNMA),Liderança Feminina no Agro,22 e 23 de outubro,São Paulo,SP
-Outubro,II Fórum Abisolo + III Simpósio Biofertilizantes,Fertilizantes,22 e 23 de outubro,Campinas,SP
-Outubro,COMCIR 2025,Cirurgia Veterinária,30 de outubro a 01 de novembro,Foz do Iguaçu,PR
-Novembro,Conf. Int. Agric. Inteligente para o Clima,Agricultura e Clima,05 de novembro,Brasília,DF
-Novembro,COP30,Clima e Sustentabilidade,10 de novembro,Belém,PA
-Novembro,FENACAM 2025,Aquicultura e Carcinicultura,11 a 14 de novembro,Natal,RN
-Novembro,SIMLEITE,Pecuária Leiteira,13 a 15 de novembro,Minas Gerais,MG
-Novembro,FIMAN 2025,Agricultura,25 a 27 de novembro,Paranavaí,PR
-Novembro,AveSummit & AveExpo 2025,Avicultura,26 a 28 de novembro,Campinas,SP
-Novembro,Congresso Nordestino de Produção Animal (CNPA),Produção Animal,26 de novembro,Maceió,AL
-Novembro,FENAGRO 2025,Pecuária e Agricultura Familiar,28 de novembro a 07 de dezembro,Salvador,BA
-Dezembro,Prêmio Visão Agro Brasil 2025,Bioenergia,04 de dezembro,Ribeirão Preto,SP
-Dezembro,Planejamento estratégico Agrolink,Estratégia,29 e 30 de dezembro,Porto Alegre,RS
-"""
-    df = pd.read_csv(io.StringIO(dados_string))
-    df['Cidade'] = df['Cidade'].str.strip()
-    df['UF'] = df['UF'].str.strip()
-    df.dropna(subset=['Evento', 'Cidade', 'UF'], inplace=True)
-    df = df[~df['Cidade'].str.contains('A definir|Online', na=False)]
-    df['Mês'] = df['Mês'].ffill()
-    df['Localizacao'] = df['Cidade'] + ', ' + df['UF']
-    df.rename(columns={'Mês': 'Mes', 'Evento': 'Nome', 'Foco': 'Segmento', 'Data': 'Datas'}, inplace=True)
-    return df.reset_index()
-
-@st.cache_data
-def geocode_dataframe(df):
+    """Catálogo completo a partir de dados/eventos; só os ficheiros alterados são relidos."""
+    return obter_catalogo().atualizar()
+
+@st.cache_resource
+def obter_geocode_cache():
+    # Uma vez por processo: as entradas expiradas saem da base em vez de se acumularem
+    cache = GeocodeCache()
+    cache.limpar_expirados()
+    return cache
+
+@st.cache_resource
+def obter_gazetteer():
+    return Gazetteer()
+
+@st.cache_resource
+def obter_geocodificacao_em_fundo():
+    # Partilhada por todas as sessões e reconstruções: um só limite de pedidos ao Nominatim
+    # e nenhuma localização pedida duas vezes enquanto um trabalho ainda a está a resolver
     geolocator = Nominatim(user_agent="studio-data-dashboard-v14")
-    location_coords = {}
-    with st.spinner("A geocodificar localizações... (executado apenas uma vez)"):
-        for index, row in df.iterrows():
-            try:
-                location_data = geolocator.geocode(row['Localizacao'])
-                if location_data:
-                    location_coords[row['Localizacao']] = (location_data.latitude, location_data.longitude)
-                time.sleep(1)
-            except Exception:
-                pass
-    df['Latitude'] = df['Localizacao'].map(lambda x: location_coords.get(x, (None, None))[0])
-    df['Longitude'] = df['Localizacao'].map(lambda x: location_coords.get(x, (None, None))[1])
-    return df
+    return GeocodificacaoEmFundo(geolocator, obter_geocode_cache(), taxa=NOMINATIM_TAXA, intervalo_nova_tentativa=INTERVALO_NOVA_TENTATIVA)
+
+def geocode_dataframe(df):
+    """Preenche Latitude/Longitude e devolve `(df, trabalho)`.
+
+    O `trabalho` (ou `None`) continua a geocodificar remotamente em segundo plano o
+    que o gazetteer e a cache não resolveram; o `df` já inclui os resultados obtidos até agora.
+    """
+    trabalhos = []
+
+    def remoto(pendentes):
+        trabalho = obter_geocodificacao_em_fundo().pedir(pendentes)
+        trabalhos.append(trabalho)
+        return trabalho.resultados()
+
+    if USAR_NOMINATIM:
+        geocodificar_dataframe(df, obter_gazetteer(), remoto, obter_geocode_cache())
+    else:
+        geocodificar_dataframe(df, obter_gazetteer())
+    return df, trabalhos[0] if trabalhos else None
+
+def construir_dados():
+    # Corre no arranque ou numa thread de fundo: tem o seu próprio perfil, fora dos reruns
+    perfil = metricas.Perfil("construcao_dados")
+    with perfil.ativo():
+        with metricas.medir('carregar_eventos'):
+            df_completo = carregar_e_limpar_dados()
+        alteracoes = obter_catalogo().ultimas_alteracoes
+        metricas.contar_cache(
+            'catalogo_ficheiros', acertos=len(alteracoes['inalterados']), falhas=len(alteracoes['novos']) + len(alteracoes['alterados'])
+        )
+        # Só as linhas novas (ou ainda sem coordenadas) passam pela geocodificação
+        sem_coordenadas = df_completo['Latitude'].isna()
+        with metricas.medir('geocodificar'):
+            df_geocoded, trabalho = geocode_dataframe(df_completo[sem_coordenadas].copy())
+            df_completo.loc[sem_coordenadas, ['Latitude', 'Longitude']] = df_geocoded[['Latitude', 'Longitude']]
+        obter_catalogo().registar_coordenadas(df_completo)
+        df_completo = df_completo.dropna(subset=['Latitude', 'Longitude'])
+        metricas.registar(eventos=len(df_completo), linhas_geocodificadas=int(sem_coordenadas.sum()))
+    obter_registo_metricas().registar(perfil)
+    return df_completo, trabalho
+
+@st.cache_resource
+def obter_dataset_compartilhado():
+    # Um único dataset (e índices) por processo, em vez de uma cópia por sessão.
+    # Com um snapshot feito pelo construir_snapshot.py para os ficheiros atuais, o
+    # arranque só abre os ficheiros; sem ele (ou desatualizado) corre a preparação completa.
+    metricas.falha_cache('dataset')
+    catalogo = obter_catalogo()
+    with metricas.medir('snapshot'):
+        carregado = carregar_snapshot(catalogo.hashes())
+    if carregado is None:
+        return DatasetCompartilhado(construir_dados)
+    df_catalogo, dataset, manifesto = carregado
+    catalogo.semear(df_catalogo, manifesto['fontes'], manifesto['erros'])
+    compartilhado = DatasetCompartilhado(construir_dados, inicial=dataset)
+    if manifesto['nao_resolvidas'] and USAR_NOMINATIM:
+        # O que o snapshot não resolveu segue para o Nominatim em segundo plano
+        compartilhado.atualizar_em_fundo()
+    return compartilhado
+
+def obter_dataset():
+    """Dataset atual; se houver ficheiros de eventos alterados, inicia a reconstrução em fundo."""
+    compartilhado = obter_dataset_compartilhado()
+    catalogo = obter_catalogo()
+    agora = time.monotonic()
+    if agora - st.session_state.get('ultima_verificacao_catalogo', 0) > INTERVALO_VERIFICACAO_CATALOGO:
+        st.session_state.ultima_verificacao_catalogo = agora
+        trabalho = compartilhado.atual().trabalho
+        # Ficheiros alterados, ou localizações que falharam e já podem ser tentadas de novo
+        if catalogo.ha_alteracoes() or (trabalho is not None and trabalho.repetir_falhas(INTERVALO_NOVA_TENTATIVA)):
+            compartilhado.atualizar_em_fundo()
+    return compartilhado.atual()
+
+@st.cache_resource
+def obter_expositores_store():
+    # Importa só os ficheiros de dados/expositores novos ou alterados desde o último arranque
+    store = ExpositoresStore()
+    store.importar_diretorio()
+    return store
+
+def obter_expositores(dataset):
+    # Os evento_id mudam com o catálogo: volta a associar sempre que o dataset muda de versão
+    store = obter_expositores_store()
+    if store.versao_eventos != dataset.versao:
+        eventos = dataset.df.drop_duplicates('Nome')
+        store.associar_eventos(dict(zip(eventos['Nome'], eventos['evento_id'])), dataset.versao)
+    return store
+
+@st.cache_resource(max_entries=32)
+def obter_cubo_filtrado(versao_dados, chave_filtros, _df_filtrado):
+    # Filtros que o cubo do dataset não cobre (segmento, período, proximidade): cubo das linhas filtradas
+    metricas.falha_cache('cubo_filtrado')
+    return CuboContagens.a_partir_de(_df_filtrado)
+
+# As caches guardam só os dados das camadas; o st_folium altera o mapa e os FeatureGroups
+# que recebe, por isso estes são criados de novo em cada rerun com `camada_de_dados`
+@st.cache_resource(max_entries=32)
+def obter_camada_eventos(versao_dados, chave_filtros, agrupar, _df_filtrado):
+    # Memoizada pelo estado dos filtros: trocar o evento selecionado não refaz estes dados
+    metricas.falha_cache('camada_eventos')
+    dados = dados_eventos(_df_filtrado, agrupar)
+    return dados, medir_dados(dados)
+
+@st.cache_resource(max_entries=64)
+def obter_camada_viewport(versao_dados, chave_filtros, limites, zoom, agrupar, _df_filtrado, _agregados_uf):
+    metricas.falha_cache('camada_viewport')
+    dados, descricao = dados_viewport(_df_filtrado, limites, zoom, agrupar, _agregados_uf)
+    return dados, descricao, medir_dados(dados)
+
+@st.fragment(run_every=2)
+def acompanhar_geocodificacao(dataset):
+    compartilhado = obter_dataset_compartilhado()
+    contagem, _ = dataset.trabalho.relatorio()
+    total = len(dataset.trabalho.localizacoes)
+    st.caption(f"A geocodificar {contagem['pendentes']} de {total} localizações em segundo plano...")
+    # Novos resultados levam a uma reconstrução em fundo; o rerun só acontece depois da troca
+    if dataset.desatualizado():
+        compartilhado.atualizar_em_fundo()
+    if compartilhado.atual() is not dataset:
+        st.rerun(scope="app")
+
+def mostrar_estado_geocodificacao(dataset):
+    trabalho = dataset.trabalho
+    if trabalho is None:
+        return
+    if dataset.parcial:
+        acompanhar_geocodificacao(dataset)
+        return
+    contagem, nao_resolvidas = trabalho.relatorio()
+    if nao_resolvidas:
+        with st.expander(f"{len(nao_resolvidas)} localizações sem coordenadas (fora do mapa)"):
+            st.write(f"Não encontradas: {contagem.get(ESTADO_NAO_ENCONTRADO, 0)} · Falhas: {contagem.get(ESTADO_FALHA, 0)}")
+            st.write(", ".join(nao_resolvidas))
+
+def mostrar_resumo(cubo, meses=(), ufs=()):
+    """Resumo a partir do cubo de contagens: o custo não depende do número de eventos."""
+    with st.expander("Resumo por mês, UF e segmento"):
+        por_mes_uf = cubo.por_mes_uf(meses, ufs)
+        segmentos = cubo.top_segmentos(meses, ufs)
+        metricas_resumo = st.columns(3)
+        metricas_resumo[0].metric("Eventos", cubo.total(meses, ufs))
+        metricas_resumo[1].metric("Estados", len(por_mes_uf.columns))
+        metricas_resumo[2].metric("Segmento principal", segmentos.index[0] if len(segmentos) else "—")
+        st.write("**Eventos por mês e UF**")
+        st.dataframe(por_mes_uf, use_container_width=True)
+        st.write("**Segmentos com mais eventos**")
+        st.bar_chart(segmentos, horizontal=True)
+
+def eh_admin():
+    # Administradores: lista `admins` (emails) no secrets.toml, ao lado de `users`
+    return st.session_state.get("username") in st.secrets.get("admins", [])
+
+def mostrar_painel_desempenho():
+    registo = obter_registo_metricas()
+    with st.expander("Desempenho (admin)"):
+        perfis = registo.perfis()
+        if not perfis:
+            st.caption("Ainda não há reruns registados.")
+            return
+        ultimo = perfis[-1]
+        st.caption(
+            f"{len(perfis)} reruns recentes · último: {1000 * ultimo.duracao:.0f} ms · "
+            + " · ".join(f"{nome}: {valor}" for nome, valor in ultimo.valores.items())
+        )
+        st.dataframe(pd.DataFrame(registo.resumo_fases()).round(1), use_container_width=True, hide_index=True)
+        construcoes = registo.resumo_fases("construcao_dados")
+        if construcoes:
+            st.write("**Preparação dos dados**")
+            st.dataframe(pd.DataFrame(construcoes).round(1), use_container_width=True, hide_index=True)
+        st.write("**Caches**")
+        st.dataframe(pd.DataFrame(registo.taxas_cache()).round(3), use_container_width=True, hide_index=True)
+        if registo.diretorio:
+            st.caption(f"Exportado para {registo.caminho_jsonl} e {registo.caminho_prometheus}")
+        st.download_button("Descarregar métricas (Prometheus)", registo.texto_prometheus(), file_name="dashboard.prom")
 
 # --- FUNÇÃO DO DASHBOARD PRINCIPAL ---
 def main_dashboard():
@@ -220,10 +289,22 @@ def main_dashboard():
         st.session_state.meses_selecionados = []
     if 'ufs_selecionados' not in st.session_state:
         st.session_state.ufs_selecionados = []
+    if 'segmentos_selecionados' not in st.session_state:
+        st.session_state.segmentos_selecionados = []
+    if 'periodo_selecionado' not in st.session_state:
+        st.session_state.periodo_selecionado = ()
+    if 'cidade_referencia' not in st.session_state:
+        st.session_state.cidade_referencia = None
+    if 'raio_km' not in st.session_state:
+        st.session_state.raio_km = 200
+    if 'vizinhos_k' not in st.session_state:
+        st.session_state.vizinhos_k = 0
     if 'show_expositor_details' not in st.session_state:
         st.session_state.show_expositor_details = False
     if 'expositor_details' not in st.session_state:
         st.session_state.expositor_details = {}
+    if 'versao_tabela_expositores' not in st.session_state:
+        st.session_state.versao_tabela_expositores = 0
 
     # --- NOVO CABEÇALHO ---
     header_cols = st.columns([0.8, 0.2])
@@ -234,7 +315,13 @@ def main_dashboard():
     
     st.divider()
 
-    df_base = st.session_state.df_base
+    with metricas.medir('dataset'):
+        dataset = obter_dataset()
+    df_base = dataset.df
+    motor_filtros = dataset.motor_filtros
+    mostrar_estado_geocodificacao(dataset)
+    for erro in obter_catalogo().erros.values():
+        st.warning(f"Ficheiro de eventos ignorado: {erro}")
 
     col1, col2 = st.columns([3, 2])
 
@@ -249,93 +336,186 @@ def main_dashboard():
                 st.write(content['descricao'])
                 if st.button("Fechar", key="close_details"):
                     st.session_state.show_expositor_details = False
+                    # Tabela nova, sem linha selecionada: o mesmo expositor pode voltar a ser aberto
+                    st.session_state.expositor_selecionado = None
+                    st.session_state.versao_tabela_expositores += 1
                     st.rerun()
 
         st.subheader("Filtros e Controles")
         if st.button("Limpar Filtros"):
             st.session_state.meses_selecionados = []
             st.session_state.ufs_selecionados = []
+            st.session_state.segmentos_selecionados = []
+            st.session_state.periodo_selecionado = ()
+            st.session_state.cidade_referencia = None
             st.rerun()
 
-        meses_ordem = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-        meses_disponiveis = sorted(df_base['Mes'].unique(), key=lambda x: meses_ordem.index(x))
+        meses_presentes = set(motor_filtros.valores('Mes'))
+        meses_disponiveis = [mes for mes in MESES if mes in meses_presentes]
         
         meses_selecionados = st.multiselect("Filtrar por Mês:", options=meses_disponiveis, default=st.session_state.meses_selecionados)
-        ufs_selecionados = st.multiselect("Filtrar por Estado (UF):", options=sorted(df_base['UF'].unique()), default=st.session_state.ufs_selecionados)
+        ufs_selecionados = st.multiselect("Filtrar por Estado (UF):", options=motor_filtros.valores('UF'), default=st.session_state.ufs_selecionados)
+        segmentos_selecionados = st.multiselect("Filtrar por Segmento:", options=motor_filtros.valores('Segmento'), default=st.session_state.segmentos_selecionados)
+        periodo_selecionado = st.date_input("Filtrar por período (eventos a decorrer):", value=st.session_state.periodo_selecionado, format="DD/MM/YYYY")
+
+        municipios = obter_gazetteer().municipios
+        with st.expander("Eventos próximos de uma cidade", expanded=st.session_state.cidade_referencia is not None):
+            cidade_referencia = st.selectbox(
+                "Cidade de referência:",
+                options=[None, *municipios],
+                index=0 if st.session_state.cidade_referencia is None else municipios.index(st.session_state.cidade_referencia) + 1,
+                format_func=lambda cidade: "Nenhuma" if cidade is None else cidade,
+            )
+            raio_km = st.slider("Raio (km):", min_value=10, max_value=1000, value=st.session_state.raio_km, step=10)
+            vizinhos_k = st.number_input("Ou só os N eventos mais próximos (0 = usar o raio):", min_value=0, max_value=100, value=st.session_state.vizinhos_k)
         
         st.session_state.meses_selecionados = meses_selecionados
         st.session_state.ufs_selecionados = ufs_selecionados
+        st.session_state.segmentos_selecionados = segmentos_selecionados
+        st.session_state.periodo_selecionado = periodo_selecionado
+        st.session_state.cidade_referencia = cidade_referencia
+        st.session_state.raio_km = raio_km
+        st.session_state.vizinhos_k = vizinhos_k
 
-        df_filtrado = df_base.copy()
-        if meses_selecionados:
-            df_filtrado = df_filtrado[df_filtrado['Mes'].isin(meses_selecionados)]
-        if ufs_selecionados:
-            df_filtrado = df_filtrado[df_filtrado['UF'].isin(ufs_selecionados)]
+        if periodo_selecionado:
+            sem_data = int((~df_base['data_valida']).sum())
+            if sem_data:
+                st.caption(f"{sem_data} eventos sem data reconhecida ficam fora do filtro de período.")
+        with metricas.medir('filtros'):
+            referencia = None
+            if cidade_referencia is not None:
+                coordenadas = obter_gazetteer().geocode(cidade_referencia)
+                referencia = (coordenadas.latitude, coordenadas.longitude)
+            df_filtrado = dataset.filtrar(
+                {'Mes': meses_selecionados, 'UF': ufs_selecionados, 'Segmento': segmentos_selecionados},
+                periodo_selecionado, referencia, raio_km, vizinhos_k,
+            )
+        metricas.registar(linhas_filtradas=len(df_filtrado))
+        chave_filtros = (
+            tuple(meses_selecionados), tuple(ufs_selecionados), tuple(segmentos_selecionados), tuple(periodo_selecionado),
+            cidade_referencia, raio_km, vizinhos_k,
+        )
+        # Só com filtros de mês e UF, o cubo do dataset responde sem percorrer as linhas
+        if not segmentos_selecionados and not periodo_selecionado and cidade_referencia is None:
+            cubo, selecao_cubo = dataset.cubo, (meses_selecionados, ufs_selecionados)
+        else:
+            with metricas.acesso_cache('cubo_filtrado'):
+                cubo, selecao_cubo = obter_cubo_filtrado(dataset.versao, chave_filtros, df_filtrado), ((), ())
 
-        event_list = df_filtrado['Nome'].tolist()
-        event_list.insert(0, "Limpar seleção e resetar mapa")
-        
-        selected_event_name = st.selectbox("Selecione um evento para destacar no mapa:", options=event_list, index=0)
+        nomes_eventos = nomes_para_selecao(df_filtrado)
+        selected_event_id = st.selectbox(
+            "Selecione um evento para destacar no mapa:",
+            options=[None, *nomes_eventos],
+            format_func=lambda evento_id: nomes_eventos.get(evento_id, "Limpar seleção e resetar mapa"),
+            index=0,
+        )
 
-        if selected_event_name != "Limpar seleção e resetar mapa":
-            st.session_state.selected_event_index = df_filtrado[df_filtrado['Nome'] == selected_event_name].index[0]
+        if selected_event_id is not None:
+            st.session_state.selected_event_index = motor_filtros.rotulos[motor_filtros.posicao_de(selected_event_id)]
+            selected_event_name = df_base.at[st.session_state.selected_event_index, 'Nome']
         else:
             st.session_state.selected_event_index = None
+            selected_event_name = None
         
         st.subheader("Dados dos Eventos")
-        st.dataframe(df_filtrado[['Nome', 'Datas', 'Segmento', 'Cidade', 'UF']], use_container_width=True, hide_index=True, height=250)
+        colunas_tabela = ['Nome', 'Datas', 'Segmento', 'Cidade', 'UF']
+        if cidade_referencia is not None:
+            colunas_tabela.append('Distância (km)')
+        with metricas.medir('tabela'):
+            st.dataframe(df_filtrado[colunas_tabela], use_container_width=True, hide_index=True, height=250)
+        estado_dados = f"Dados v{dataset.numero} ({dataset.versao}) · {len(df_base)} eventos · {dataset.memoria_bytes() / 1024 ** 2:.2f} MB partilhados entre sessões"
+        if obter_dataset_compartilhado().a_atualizar:
+            estado_dados += f" · v{dataset.numero + 1} a ser preparada em segundo plano"
+        st.caption(estado_dados)
+        with metricas.medir('resumo'):
+            mostrar_resumo(cubo, *selecao_cubo)
 
-        if selected_event_name and selected_event_name in expositores_db:
-            lista_de_expositores = expositores_db[selected_event_name]
-            if not lista_de_expositores:
+        with metricas.medir('expositores'):
+            expositores_store = obter_expositores(dataset)
+            if selected_event_id is not None and selected_event_id in expositores_store.eventos_com_expositores():
                 with st.expander(f"Expositores de {selected_event_name}", expanded=True):
-                    st.info("A lista de expositores para este evento ainda não foi adicionada.")
-            else:
-                with st.expander(f"Expositores de {selected_event_name}", expanded=True):
-                    expositores = pd.DataFrame(lista_de_expositores)
-                    expositores_exploded = expositores.explode('segmento')
-                    segmentos = sorted(expositores_exploded['segmento'].unique())
-                    
-                    for segmento in segmentos:
-                        st.markdown(f"**{segmento}**")
-                        expositores_segmento = expositores_exploded[expositores_exploded['segmento'] == segmento]
-                        
-                        for _, row in expositores_segmento.iterrows():
-                            original_expositor_data = expositores[expositores['nome'] == row['nome']].iloc[0].to_dict()
-                            if st.button(row['nome'], key=f"{selected_event_name}_{row['nome']}_{segmento}", use_container_width=True):
-                                st.session_state.expositor_details = original_expositor_data
-                                st.session_state.show_expositor_details = True
-                                st.rerun()
+                    filtros_expositores = st.columns([0.6, 0.4])
+                    with filtros_expositores[0]:
+                        pesquisa = st.text_input("Pesquisar expositor:", key=f"pesquisa_{selected_event_id}")
+                    with filtros_expositores[1]:
+                        segmento = st.selectbox(
+                            "Segmento:", options=[None, *expositores_store.segmentos(selected_event_id)],
+                            format_func=lambda segmento: "Todos" if segmento is None else segmento, key=f"segmento_{selected_event_id}",
+                        )
+                    total_expositores = expositores_store.contar(selected_event_id, pesquisa, segmento)
+                    paginas = max(1, math.ceil(total_expositores / EXPOSITORES_POR_PAGINA))
+                    pagina = 1
+                    if paginas > 1:
+                        pagina = st.number_input("Página:", min_value=1, max_value=paginas, value=1, key=f"pagina_{selected_event_id}")
+                    pagina_expositores = expositores_store.listar(
+                        selected_event_id, pesquisa, segmento, EXPOSITORES_POR_PAGINA, (pagina - 1) * EXPOSITORES_POR_PAGINA
+                    )
+                    metricas.registar(expositores_pagina=len(pagina_expositores))
+                    st.caption(f"{total_expositores} expositores · página {pagina} de {paginas} · selecione uma linha para ver os detalhes")
+                    tabela_expositores = pd.DataFrame({
+                        'Expositor': [expositor['nome'] for expositor in pagina_expositores],
+                        'Segmentos': [', '.join(expositor['segmento']) for expositor in pagina_expositores],
+                    })
+                    selecao = st.dataframe(
+                        tabela_expositores, use_container_width=True, hide_index=True,
+                        on_select="rerun", selection_mode="single-row",
+                        # Outra pesquisa, segmento ou página é outra tabela: a linha selecionada não transita
+                        key=f"expositores_{selected_event_id}_{pesquisa}_{segmento}_{pagina}_{st.session_state.versao_tabela_expositores}",
+                    )
+                    linhas_selecionadas = [linha for linha in selecao.selection.rows if linha < len(pagina_expositores)]
+                    if linhas_selecionadas and pagina_expositores[linhas_selecionadas[0]]['id'] != st.session_state.get('expositor_selecionado'):
+                        expositor = pagina_expositores[linhas_selecionadas[0]]
+                        st.session_state.expositor_selecionado = expositor['id']
+                        st.session_state.expositor_details = expositor
+                        st.session_state.show_expositor_details = True
+                        st.rerun()
 
     with col1:
         st.subheader("Mapa Interativo dos Eventos")
         
+        selected_row = None
         if st.session_state.selected_event_index is not None and st.session_state.selected_event_index in df_filtrado.index:
             selected_row = df_filtrado.loc[st.session_state.selected_event_index]
             map_center = [selected_row['Latitude'], selected_row['Longitude']]
-            map_zoom = 12
+            map_zoom = ZOOM_EVENTO
         else:
-            map_center = [-14.2350, -51.9253]
-            map_zoom = 4
+            map_center = CENTRO_BRASIL
+            map_zoom = ZOOM_BRASIL
 
-        m = folium.Map(location=map_center, zoom_start=map_zoom, tiles="CartoDB dark_matter")
-        
-        m.get_root().html.add_child(folium.Element("<style>.leaflet-control-attribution {display: none !important;}</style>"))
-
-        for idx, row in df_filtrado.iterrows():
-            is_selected = (st.session_state.selected_event_index == idx)
-            folium.CircleMarker(
-                location=[row['Latitude'], row['Longitude']],
-                radius=8,
-                color="red" if is_selected else "#2ECC71",
-                fill=True,
-                fill_color="red" if is_selected else "#2ECC71",
-                fill_opacity=0.7 if is_selected else 0.4,
-                popup=f"<b>{row['Nome']}</b><br>{row['Cidade']}, {row['UF']}",
-                tooltip=row['Nome']
-            ).add_to(m)
-        
-        st_folium(m, use_container_width=True, returned_objects=[])
+        controlos_mapa = st.columns(2)
+        with controlos_mapa[0]:
+            agrupar = st.toggle("Agrupar marcadores", value=len(df_filtrado) > LIMITE_AGRUPAMENTO)
+        with controlos_mapa[1]:
+            so_area_visivel = st.toggle("Carregar só a área visível", value=len(df_filtrado) > LIMITE_AGRUPAMENTO)
+        with metricas.medir('mapa_camada'):
+            if so_area_visivel:
+                # Limites e zoom devolvidos pelo st_folium na interação anterior
+                estado_mapa = st.session_state.get('mapa') or {}
+                zoom_atual = estado_mapa.get('zoom') or map_zoom
+                limites = limites_viewport(estado_mapa.get('bounds'), zoom_atual)
+                agregados_uf = None
+                if zoom_atual <= ZOOM_MAXIMO_UF:
+                    # Contagens por UF vêm do cubo e não dependem da área visível
+                    limites, agregados_uf = None, cubo.agregados_uf(*selecao_cubo)
+                with metricas.acesso_cache('camada_viewport'):
+                    dados_camada, descricao, (marcadores, tamanho) = obter_camada_viewport(
+                        dataset.versao, chave_filtros, limites, zoom_atual, agrupar, df_filtrado, agregados_uf
+                    )
+                st.caption(descricao)
+            else:
+                with metricas.acesso_cache('camada_eventos'):
+                    dados_camada, (marcadores, tamanho) = obter_camada_eventos(dataset.versao, chave_filtros, agrupar, df_filtrado)
+            camada = camada_de_dados(dados_camada)
+            camada_destaque = camada_selecao(selected_row)
+        metricas.registar(marcadores=marcadores + (selected_row is not None), payload_mapa_bytes=tamanho)
+        with metricas.medir('mapa_st_folium'):
+            st_folium(
+                criar_mapa_base(), key='mapa', center=map_center, zoom=map_zoom, feature_group_to_add=[camada, camada_destaque],
+                use_container_width=True, returned_objects=['bounds', 'zoom'] if so_area_visivel else [],
+            )
+
+    if eh_admin():
+        mostrar_painel_desempenho()
 
 # --- LÓGICA DE LOGIN ---
 def check_login():
@@ -372,11 +552,21 @@ def check_login():
 
 
 # --- EXECUÇÃO PRINCIPAL ---
-if check_login():
-    # Carrega os dados uma vez após o login e guarda-os na sessão
-    if 'df_base' not in st.session_state:
-        with st.spinner("A carregar e preparar os dados... Isto pode demorar um pouco na primeira vez."):
-            df_completo = carregar_e_limpar_dados()
-            df_geocoded = geocode_dataframe(df_completo.copy())
-            st.session_state.df_base = df_geocoded.dropna(subset=['Latitude', 'Longitude']).copy()
-    main_dashboard()
+# Cada rerun tem um perfil com o tempo de cada fase; é registado mesmo quando o
+# rerun é interrompido (st.rerun, nova interação), para não esconder os casos lentos
+perfil = metricas.Perfil()
+try:
+    with perfil.ativo():
+        with metricas.medir('check_login'):
+            autenticado = check_login()
+        if autenticado:
+            # Os dados são preparados uma vez por processo e partilhados por todas as sessões
+            with st.spinner("A carregar e preparar os dados... Isto pode demorar um pouco na primeira vez."):
+                with metricas.acesso_cache('dataset'), metricas.medir('carregar_dados'):
+                    obter_dataset_compartilhado()
+            main_dashboard()
+finally:
+    registo_metricas = obter_registo_metricas()
+    geocode_cache = obter_geocode_cache()
+    registo_metricas.definir_cache('geocode_sqlite', geocode_cache.hits, geocode_cache.misses)
+    registo_metricas.registar(perfil)
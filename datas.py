@@ -0,0 +1,117 @@
+"""Interpretação da coluna de texto livre `Datas` e índice de intervalos de datas."""
+import numpy as np
+import pandas as pd
+
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+_NUMERO_MES = {mes.lower(): numero for numero, mes in enumerate(MESES, start=1)}
+_NUMERO_MES['marco'] = 3
+
+# "14", "14 a 16", "28 e 29", "28 a 03/05", "02 a 11 de julho", "28 de julho",
+# "30 de agosto a 07 de setembro"
+_PADRAO_DATAS = (
+    r'^\s*(?P<dia_inicio>\d{1,2})(?:\s+de\s+(?P<mes_inicio>[^\W\d_]+))?'
+    r'(?:\s+(?:a|e)\s+(?P<dia_fim>\d{1,2})(?:/(?P<mes_fim_num>\d{1,2})|\s+de\s+(?P<mes_fim>[^\W\d_]+))?)?\s*$'
+)
+
+
+def _numero_mes(nomes):
+    return nomes.str.lower().map(_NUMERO_MES).astype('float64').to_numpy()
+
+
+def _ano_por_linha(df):
+    # Ano explícito no nome do evento ("Expointer 2025"); os restantes herdam o ano
+    # mais frequente do seu mês e, em meses sem nenhum, o do mês anterior/seguinte
+    # (ou o ano corrente, se o catálogo não indicar nenhum).
+    ano_explicito = pd.to_numeric(df['Nome'].str.extract(r'\b(20\d{2})\b', expand=False), errors='coerce')
+    ano_mes = ano_explicito.groupby(df['Mes']).agg(lambda anos: anos.mode().iloc[0] if anos.notna().any() else np.nan)
+    ano_mes = ano_mes.reindex(MESES).ffill().bfill()
+    ano = ano_explicito.fillna(df['Mes'].map(ano_mes)).fillna(pd.Timestamp.today().year)
+    return ano.to_numpy(dtype='float64')
+
+
+def interpretar_datas(df):
+    """Acrescenta as colunas `inicio`, `fim` (datetime64) e `data_valida` ao `df`.
+
+    O mês e o ano omitidos no texto vêm da coluna `Mes` e do nome do evento. Linhas
+    vazias ou que não seguem nenhum dos formatos ficam com `data_valida = False`
+    e `inicio`/`fim` a NaT.
+    """
+    partes = df['Datas'].fillna('').astype(str).str.extract(_PADRAO_DATAS)
+    dia_inicio = pd.to_numeric(partes['dia_inicio'], errors='coerce').to_numpy()
+    dia_fim = pd.to_numeric(partes['dia_fim'], errors='coerce').to_numpy()
+    dia_fim = np.where(np.isnan(dia_fim), dia_inicio, dia_fim)
+
+    mes_listado = _numero_mes(df['Mes'].fillna(''))
+    mes_inicio = _numero_mes(partes['mes_inicio'].fillna(''))
+    mes_fim = pd.to_numeric(partes['mes_fim_num'], errors='coerce').to_numpy()
+    mes_fim = np.where(np.isnan(mes_fim), _numero_mes(partes['mes_fim'].fillna('')), mes_fim)
+
+    # Meses contados desde o ano 0 para tratar a passagem de mês/ano de forma uniforme
+    ano = _ano_por_linha(df)
+    vira_mes = dia_fim < dia_inicio
+    sem_mes_inicio = np.isnan(mes_inicio)
+    sem_mes_fim = np.isnan(mes_fim)
+    absoluto_inicio = np.where(
+        ~sem_mes_inicio, ano * 12 + mes_inicio - 1,
+        np.where(~sem_mes_fim, ano * 12 + mes_fim - 1 - vira_mes, ano * 12 + mes_listado - 1),
+    )
+    absoluto_fim = np.where(~sem_mes_fim, ano * 12 + mes_fim - 1, absoluto_inicio + vira_mes)
+    # Mês final explícito antes do inicial (ex.: dezembro a janeiro) passa para o ano seguinte
+    absoluto_fim = np.where(absoluto_fim < absoluto_inicio, absoluto_fim + 12, absoluto_fim)
+
+    def _para_datas(absoluto, dia):
+        componentes = pd.DataFrame({'year': absoluto // 12, 'month': absoluto % 12 + 1, 'day': dia})
+        return pd.to_datetime(componentes, errors='coerce')
+
+    df['inicio'] = _para_datas(absoluto_inicio, dia_inicio).to_numpy()
+    df['fim'] = _para_datas(absoluto_fim, dia_fim).to_numpy()
+    df['data_valida'] = df['inicio'].notna() & df['fim'].notna()
+    df.loc[~df['data_valida'], ['inicio', 'fim']] = pd.NaT
+    return df
+
+
+class IndiceIntervalos:
+    """Índice de intervalos [inicio, fim] para consultas de sobreposição sub-lineares.
+
+    Os intervalos ficam ordenados por `inicio`, com o máximo acumulado de `fim`;
+    uma consulta faz duas pesquisas binárias e só percorre a faixa candidata.
+    Linhas sem data válida ficam fora do índice.
+    """
+
+    def __init__(self, rotulos, inicio, fim):
+        inicio = np.asarray(inicio, dtype='datetime64[ns]')
+        fim = np.asarray(fim, dtype='datetime64[ns]')
+        validos = ~(np.isnat(inicio) | np.isnat(fim))
+        ordem = np.argsort(inicio[validos], kind='stable')
+        self.rotulos = np.asarray(rotulos)[validos][ordem]
+        self.inicio = inicio[validos][ordem]
+        self.fim = fim[validos][ordem]
+        self._fim_maximo = np.maximum.accumulate(self.fim) if len(self.fim) else self.fim
+
+    @classmethod
+    def a_partir_de(cls, df):
+        return cls(df.index.to_numpy(), df['inicio'].to_numpy(), df['fim'].to_numpy())
+
+    def para_arrays(self):
+        return {'rotulos': self.rotulos, 'inicio': self.inicio, 'fim': self.fim, 'fim_maximo': self._fim_maximo}
+
+    @classmethod
+    def de_arrays(cls, arrays):
+        """Reconstrói o índice a partir de `para_arrays()` sem voltar a ordenar."""
+        indice = cls.__new__(cls)
+        indice.rotulos = arrays['rotulos']
+        indice.inicio = arrays['inicio']
+        indice.fim = arrays['fim']
+        indice._fim_maximo = arrays['fim_maximo']
+        return indice
+
+    def sobrepostos(self, inicio, fim=None):
+        """Rótulos dos eventos cujo intervalo intersecta [inicio, fim]."""
+        inicio = np.datetime64(pd.Timestamp(inicio), 'ns')
+        fim = inicio if fim is None else np.datetime64(pd.Timestamp(fim), 'ns')
+        # Intervalos que começam depois de `fim` nunca se sobrepõem; antes do primeiro
+        # índice com fim máximo >= `inicio`, também não.
+        limite = np.searchsorted(self.inicio, fim, side='right')
+        primeiro = np.searchsorted(self._fim_maximo[:limite], inicio, side='left')
+        faixa = slice(primeiro, limite)
+        return self.rotulos[faixa][self.fim[faixa] >= inicio]
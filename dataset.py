@@ -0,0 +1,123 @@
+"""Dataset preparado (dados geocodificados e índices), partilhado por todas as sessões do processo."""
+import hashlib
+import threading
+import time
+
+import pandas as pd
+
+from agregados import CuboContagens
+from datas import IndiceIntervalos
+from espacial import IndiceEspacial
+from filtros import MotorFiltros
+
+
+class DatasetPreparado:
+    """Dados geocodificados e os índices construídos sobre eles, tratados como só de leitura.
+
+    As sessões recebem sempre a mesma instância e nunca a alteram: filtros e
+    pesquisas devolvem posições, e só as linhas mostradas são materializadas.
+    """
+
+    def __init__(self, df, trabalho=None, numero=0, indices=None, cubo=None, anterior=None, versao=None):
+        self.df = df
+        self.trabalho = trabalho
+        self.numero = numero
+        self.criado_em = time.time()
+        if indices is None:
+            indices = IndiceIntervalos.a_partir_de(df), MotorFiltros(df), IndiceEspacial.a_partir_de(df)
+        self.indice_datas, self.motor_filtros, self.indice_espacial = indices
+        if cubo is None:
+            # Com a versão anterior, o cubo só reconta as linhas que mudaram
+            cubo = anterior.cubo.atualizado(anterior.df, df) if anterior is not None else CuboContagens.a_partir_de(df)
+        self.cubo = cubo
+        if versao is None:
+            # Do conteúdo de todas as colunas: mudar só o mês ou o segmento de um evento também muda a versão
+            versao = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()).hexdigest()[:12]
+        self.versao = versao
+        # Geocodificação remota ainda em curso quando este dataset foi construído
+        self.resolvidas_remotamente = len(trabalho.resultados()) if trabalho is not None else 0
+        self.parcial = trabalho is not None and not trabalho.concluido
+        self._memoria_bytes = None
+
+    def filtrar(self, selecoes, periodo=(), referencia=None, raio_km=None, vizinhos_k=0):
+        """Linhas que passam os filtros do dashboard.
+
+        `selecoes` é {coluna: valores} para o `MotorFiltros` e `periodo` (início[, fim])
+        deixa só os eventos a decorrer nesse intervalo. Com `referencia` (lat, lon)
+        ficam os eventos a menos de `raio_km` ou, com `vizinhos_k`, os k mais próximos,
+        por ordem de distância e com a coluna 'Distância (km)'.
+        """
+        motor = self.motor_filtros
+        extra = [motor.bitmap_de_rotulos(self.indice_datas.sobrepostos(*periodo))] if periodo else []
+        mascara = motor.mascara(selecoes, *extra)
+        if referencia is None:
+            return self.df.iloc[motor.posicoes(mascara)]
+        latitude, longitude = referencia
+        # Pesquisa no índice espacial restrita às linhas que passam os outros filtros
+        if vizinhos_k:
+            posicoes, distancias_km = self.indice_espacial.mais_proximos(latitude, longitude, vizinhos_k, motor.booleana(mascara))
+        else:
+            posicoes, distancias_km = self.indice_espacial.no_raio(latitude, longitude, raio_km, motor.booleana(mascara))
+        return self.df.iloc[posicoes].assign(**{'Distância (km)': distancias_km.round()})
+
+    def desatualizado(self):
+        """`True` se o trabalho de geocodificação já tem resultados que este dataset não inclui."""
+        if not self.parcial:
+            return False
+        return self.trabalho.concluido or len(self.trabalho.resultados()) != self.resolvidas_remotamente
+
+    def memoria_bytes(self):
+        """Memória ocupada pelo DataFrame e pelos índices, em bytes (calculada uma vez)."""
+        if self._memoria_bytes is not None:
+            return self._memoria_bytes
+        total = int(self.df.memory_usage(deep=True).sum())
+        total += sum(array.nbytes for array in (self.indice_datas.inicio, self.indice_datas.fim, self.indice_datas.rotulos))
+        total += sum(bitmap.nbytes for bitmaps in self.motor_filtros._bitmaps.values() for bitmap in bitmaps.values())
+        total += sum(array.nbytes for array in (
+            self.indice_espacial.latitudes, self.indice_espacial.longitudes,
+            self.indice_espacial._ordem, self.indice_espacial._celulas_ordenadas,
+        ))
+        total += self.cubo.memoria_bytes()
+        self._memoria_bytes = total
+        return total
+
+
+class DatasetCompartilhado:
+    """Referência única, por processo, ao `DatasetPreparado` atual.
+
+    `atual()` é uma simples leitura de atributo, por isso nunca bloqueia. Uma
+    atualização constrói o novo dataset numa thread à parte e troca a referência de
+    uma só vez; as sessões a meio de um rerun continuam com a versão que já tinham.
+    """
+
+    def __init__(self, construtor, inicial=None):
+        self._construtor = construtor
+        self._lock = threading.Lock()
+        self._a_atualizar = False
+        # `inicial` (p. ex. vindo de um snapshot) evita a construção síncrona no arranque
+        self._atual = inicial if inicial is not None else DatasetPreparado(*construtor(), numero=1)
+
+    def atual(self):
+        return self._atual
+
+    @property
+    def a_atualizar(self):
+        return self._a_atualizar
+
+    def atualizar_em_fundo(self):
+        """Inicia uma reconstrução, a menos que já haja uma em curso. Devolve `True` se iniciou."""
+        with self._lock:
+            if self._a_atualizar:
+                return False
+            self._a_atualizar = True
+        threading.Thread(target=self._atualizar, name="atualizar-dataset", daemon=True).start()
+        return True
+
+    def _atualizar(self):
+        try:
+            anterior = self._atual
+            novo = DatasetPreparado(*self._construtor(), numero=anterior.numero + 1, anterior=anterior)
+            self._atual = novo
+        finally:
+            with self._lock:
+                self._a_atualizar = False
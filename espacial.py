@@ -0,0 +1,120 @@
+"""Índice espacial em grelha sobre as coordenadas dos eventos e pesquisas por proximidade."""
+import math
+
+import numpy as np
+
+RAIO_TERRA_KM = 6371.0
+KM_POR_GRAU = math.pi * RAIO_TERRA_KM / 180
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Distância em km de um ponto a um vetor de pontos (graus)."""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - np.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class IndiceEspacial:
+    """Grelha regular de células de `tamanho_celula` graus, construída uma vez por dataset.
+
+    As posições dos pontos ficam ordenadas pelo número da célula (linha-major), pelo
+    que as células de cada linha da grelha dentro de uma caixa formam um intervalo
+    contíguo, encontrado com `np.searchsorted`. As distâncias exatas são calculadas
+    com haversine só sobre esses candidatos. As posições devolvidas referem-se às
+    linhas do DataFrame usado na construção.
+    """
+
+    def __init__(self, latitudes, longitudes, tamanho_celula=1.0):
+        self.latitudes = np.asarray(latitudes, dtype='float64')
+        self.longitudes = np.asarray(longitudes, dtype='float64')
+        self.tamanho_celula = tamanho_celula
+        self._colunas = int(math.ceil(360 / tamanho_celula)) + 1
+        celulas = self._celula(self.latitudes, self.longitudes)
+        self._ordem = np.argsort(celulas, kind='stable')
+        self._celulas_ordenadas = celulas[self._ordem]
+
+    @classmethod
+    def a_partir_de(cls, df, tamanho_celula=1.0):
+        return cls(df['Latitude'].to_numpy(), df['Longitude'].to_numpy(), tamanho_celula)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def para_arrays(self):
+        return {
+            'latitudes': self.latitudes, 'longitudes': self.longitudes,
+            'ordem': self._ordem, 'celulas_ordenadas': self._celulas_ordenadas,
+            'tamanho_celula': np.array(self.tamanho_celula),
+        }
+
+    @classmethod
+    def de_arrays(cls, arrays):
+        """Reconstrói o índice a partir de `para_arrays()` sem voltar a ordenar."""
+        indice = cls.__new__(cls)
+        indice.latitudes = arrays['latitudes']
+        indice.longitudes = arrays['longitudes']
+        indice.tamanho_celula = float(arrays['tamanho_celula'])
+        indice._colunas = int(math.ceil(360 / indice.tamanho_celula)) + 1
+        indice._ordem = arrays['ordem']
+        indice._celulas_ordenadas = arrays['celulas_ordenadas']
+        return indice
+
+    def _linha_coluna(self, latitude, longitude):
+        linha = np.floor((np.asarray(latitude) + 90) / self.tamanho_celula).astype('int64')
+        coluna = np.floor((np.asarray(longitude) + 180) / self.tamanho_celula).astype('int64')
+        return linha, coluna
+
+    def _celula(self, latitude, longitude):
+        linha, coluna = self._linha_coluna(latitude, longitude)
+        return linha * self._colunas + coluna
+
+    def _na_caixa(self, sul, oeste, norte, leste):
+        """Posições dos pontos nas células que intersectam a caixa (sem recorte exato)."""
+        linha_min, coluna_min = self._linha_coluna(max(sul, -90.0), max(oeste, -180.0))
+        linha_max, coluna_max = self._linha_coluna(min(norte, 90.0), min(leste, 180.0))
+        linhas = np.arange(linha_min, linha_max + 1)
+        inicios = np.searchsorted(self._celulas_ordenadas, linhas * self._colunas + coluna_min, side='left')
+        fins = np.searchsorted(self._celulas_ordenadas, linhas * self._colunas + coluna_max, side='right')
+        if not len(linhas) or not (fins - inicios).any():
+            return np.empty(0, dtype='int64')
+        return np.concatenate([self._ordem[i:f] for i, f in zip(inicios, fins) if f > i])
+
+    def _caixa(self, latitude, longitude, raio_km):
+        delta_lat = raio_km / KM_POR_GRAU
+        cos_lat = math.cos(math.radians(min(abs(latitude) + delta_lat, 89.9)))
+        delta_lon = min(raio_km / (KM_POR_GRAU * cos_lat), 180.0)
+        return latitude - delta_lat, longitude - delta_lon, latitude + delta_lat, longitude + delta_lon
+
+    def no_raio(self, latitude, longitude, raio_km, mascara=None):
+        """(posições, distâncias) dos pontos a até `raio_km`, ordenados por distância.
+
+        `mascara` (booleana, por posição) restringe a pesquisa, p. ex. aos filtros ativos.
+        """
+        candidatos = self._na_caixa(*self._caixa(latitude, longitude, raio_km))
+        if mascara is not None:
+            candidatos = candidatos[mascara[candidatos]]
+        distancias = haversine_km(latitude, longitude, self.latitudes[candidatos], self.longitudes[candidatos])
+        dentro = distancias <= raio_km
+        candidatos, distancias = candidatos[dentro], distancias[dentro]
+        ordem = np.argsort(distancias, kind='stable')
+        return candidatos[ordem], distancias[ordem]
+
+    def mais_proximos(self, latitude, longitude, k, mascara=None):
+        """(posições, distâncias) dos `k` pontos mais próximos, por ordem de distância.
+
+        Duplica o raio até conter pelo menos `k` pontos; como `no_raio` é exato,
+        nenhum ponto fora do raio pode estar mais perto do que esses.
+        """
+        disponiveis = len(self) if mascara is None else int(np.count_nonzero(mascara))
+        k = min(k, disponiveis)
+        if k <= 0:
+            return np.empty(0, dtype='int64'), np.empty(0)
+        raio_km = self.tamanho_celula * KM_POR_GRAU
+        while True:
+            posicoes, distancias = self.no_raio(latitude, longitude, raio_km, mascara)
+            if len(posicoes) >= k or raio_km >= math.pi * RAIO_TERRA_KM:
+                return posicoes[:k], distancias[:k]
+            raio_km *= 2
@@ -0,0 +1,212 @@
+"""Base de expositores em SQLite, carregada em bloco a partir de ficheiros de dados."""
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import unicodedata
+
+import pandas as pd
+
+DIRETORIO_EXPOSITORES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "expositores")
+CAMINHO_BASE_PADRAO = os.environ.get(
+    "DASHBOARD_EXPOSITORES", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "expositores.sqlite")
+)
+EXTENSOES = ('.json', '.csv', '.parquet')
+# Sobe quando muda a forma de `nome_busca`; bases antigas são recalculadas ao abrir
+VERSAO_BASE = 1
+
+
+def normalizar_nome(texto):
+    """Forma de pesquisa de um nome de expositor: sem acentos, sem maiúsculas e espaços colapsados."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).casefold().split())
+
+
+def _escapar_like(texto):
+    # `%` e `_` escritos na pesquisa são literais, não curingas do LIKE
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def ler_ficheiro_expositores(caminho):
+    """Lê um ficheiro de expositores para uma lista de dicts (evento, nome, segmento, descricao).
+
+    JSON: {"Nome do evento": [{"nome", "segmento": [...], "descricao"}, ...]}.
+    CSV/Parquet: colunas evento, nome, segmento (separados por ';') e descricao,
+    mais uma coluna evento_id opcional.
+    """
+    if caminho.endswith('.json'):
+        with open(caminho, encoding='utf-8') as ficheiro:
+            dados = json.load(ficheiro)
+        return [
+            {'evento': evento, 'evento_id': None, **expositor}
+            for evento, lista in dados.items()
+            for expositor in lista
+        ]
+    df = pd.read_parquet(caminho) if caminho.endswith('.parquet') else pd.read_csv(caminho, dtype=str)
+    if 'evento_id' not in df.columns:
+        df['evento_id'] = None
+    df['segmento'] = df['segmento'].fillna('').map(lambda texto: [s.strip() for s in texto.split(';') if s.strip()])
+    df['descricao'] = df['descricao'].fillna('Descrição não disponível.')
+    df = df.astype(object).where(df.notna(), None)
+    return df[['evento', 'evento_id', 'nome', 'segmento', 'descricao']].to_dict('records')
+
+
+class ExpositoresStore:
+    """Expositores indexados por evento, segmento e nome.
+
+    Cada ficheiro de `DIRETORIO_EXPOSITORES` é importado por inteiro e só volta a
+    sê-lo quando o seu conteúdo muda (hash SHA-1). Os expositores ficam associados
+    ao `evento_id` do catálogo através do nome do evento.
+    """
+
+    def __init__(self, caminho=CAMINHO_BASE_PADRAO):
+        self.caminho = caminho
+        self._local = threading.local()
+        # Versão do dataset de eventos usada na última `associar_eventos`
+        self.versao_eventos = None
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._criar_tabelas()
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            if self.caminho != ":memory:":
+                conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA busy_timeout=30000")
+            conexao.execute("PRAGMA foreign_keys=ON")
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar_tabelas(self):
+        with self._conexao() as conexao:
+            conexao.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS ficheiros (
+                    origem TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS expositores (
+                    id INTEGER PRIMARY KEY,
+                    origem TEXT NOT NULL,
+                    evento_nome TEXT NOT NULL,
+                    evento_id_ficheiro TEXT,
+                    evento_id TEXT,
+                    nome TEXT NOT NULL,
+                    nome_busca TEXT NOT NULL,
+                    descricao TEXT
+                );
+                CREATE TABLE IF NOT EXISTS expositor_segmentos (
+                    expositor_id INTEGER NOT NULL REFERENCES expositores(id) ON DELETE CASCADE,
+                    evento_id TEXT,
+                    segmento TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_expositores_evento ON expositores(evento_id, nome_busca);
+                CREATE INDEX IF NOT EXISTS idx_expositores_evento_nome ON expositores(evento_nome);
+                CREATE INDEX IF NOT EXISTS idx_expositores_origem ON expositores(origem);
+                CREATE INDEX IF NOT EXISTS idx_segmentos_evento ON expositor_segmentos(evento_id, segmento);
+                CREATE INDEX IF NOT EXISTS idx_segmentos_expositor ON expositor_segmentos(expositor_id);
+                """
+            )
+            if conexao.execute("PRAGMA user_version").fetchone()[0] < VERSAO_BASE:
+                nomes = conexao.execute("SELECT id, nome FROM expositores").fetchall()
+                conexao.executemany("UPDATE expositores SET nome_busca = ? WHERE id = ?", [(normalizar_nome(nome), id_) for id_, nome in nomes])
+                conexao.execute(f"PRAGMA user_version = {VERSAO_BASE}")
+
+    def importar_diretorio(self, diretorio=DIRETORIO_EXPOSITORES):
+        """Importa os ficheiros novos ou alterados e remove os que desapareceram."""
+        caminhos = sorted(c for c in glob.glob(os.path.join(diretorio, '*')) if c.endswith(EXTENSOES))
+        origens = {os.path.basename(caminho): caminho for caminho in caminhos}
+        conexao = self._conexao()
+        conhecidos = dict(conexao.execute("SELECT origem, hash FROM ficheiros").fetchall())
+        importados = 0
+        with conexao:
+            for origem in set(conhecidos) - set(origens):
+                conexao.execute("DELETE FROM expositores WHERE origem = ?", (origem,))
+                conexao.execute("DELETE FROM ficheiros WHERE origem = ?", (origem,))
+        for origem, caminho in origens.items():
+            with open(caminho, 'rb') as ficheiro:
+                hash_conteudo = hashlib.sha1(ficheiro.read()).hexdigest()
+            if conhecidos.get(origem) == hash_conteudo:
+                continue
+            self.importar(origem, ler_ficheiro_expositores(caminho), hash_conteudo)
+            importados += 1
+        return importados
+
+    def importar(self, origem, expositores, hash_conteudo=""):
+        """Substitui, numa só transação, todos os expositores vindos de `origem`."""
+        with self._conexao() as conexao:
+            conexao.execute("DELETE FROM expositores WHERE origem = ?", (origem,))
+            for expositor in expositores:
+                cursor = conexao.execute(
+                    "INSERT INTO expositores (origem, evento_nome, evento_id_ficheiro, evento_id, nome, nome_busca, descricao) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (origem, expositor['evento'], expositor.get('evento_id'), expositor.get('evento_id'), expositor['nome'],
+                     normalizar_nome(expositor['nome']), expositor.get('descricao')),
+                )
+                conexao.executemany(
+                    "INSERT INTO expositor_segmentos (expositor_id, evento_id, segmento) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, expositor.get('evento_id'), segmento) for segmento in expositor.get('segmento') or []],
+                )
+            conexao.execute("INSERT OR REPLACE INTO ficheiros VALUES (?, ?)", (origem, hash_conteudo))
+
+    def associar_eventos(self, ids_por_nome, versao=None):
+        """Resolve `evento_id` pelo nome do evento nas linhas cujo ficheiro não o indica.
+
+        Os nomes que deixaram de existir no catálogo ficam sem evento. `versao`
+        identifica o dataset de onde vêm os `ids_por_nome` e fica em `versao_eventos`.
+        """
+        with self._conexao() as conexao:
+            conexao.execute("UPDATE expositores SET evento_id = NULL WHERE evento_id_ficheiro IS NULL")
+            conexao.executemany(
+                "UPDATE expositores SET evento_id = ? WHERE evento_nome = ? AND evento_id_ficheiro IS NULL",
+                [(evento_id, nome) for nome, evento_id in ids_por_nome.items()],
+            )
+            conexao.execute(
+                """UPDATE expositor_segmentos SET evento_id = (
+                       SELECT evento_id FROM expositores WHERE expositores.id = expositor_segmentos.expositor_id
+                   )"""
+            )
+        self.versao_eventos = versao
+
+    def eventos_com_expositores(self):
+        return {linha[0] for linha in self._conexao().execute("SELECT DISTINCT evento_id FROM expositores WHERE evento_id IS NOT NULL")}
+
+    def segmentos(self, evento_id):
+        linhas = self._conexao().execute(
+            "SELECT DISTINCT segmento FROM expositor_segmentos WHERE evento_id = ? ORDER BY segmento", (evento_id,)
+        )
+        return [linha[0] for linha in linhas]
+
+    def _filtro(self, evento_id, pesquisa, segmento):
+        condicoes = ["e.evento_id = ?"]
+        parametros = [evento_id]
+        if pesquisa:
+            condicoes.append("e.nome_busca LIKE ? ESCAPE '\\'")
+            parametros.append(f"%{_escapar_like(normalizar_nome(pesquisa))}%")
+        if segmento:
+            condicoes.append("EXISTS (SELECT 1 FROM expositor_segmentos s WHERE s.expositor_id = e.id AND s.segmento = ?)")
+            parametros.append(segmento)
+        return " AND ".join(condicoes), parametros
+
+    def contar(self, evento_id, pesquisa=None, segmento=None):
+        condicao, parametros = self._filtro(evento_id, pesquisa, segmento)
+        return self._conexao().execute(f"SELECT COUNT(*) FROM expositores e WHERE {condicao}", parametros).fetchone()[0]
+
+    def listar(self, evento_id, pesquisa=None, segmento=None, limite=50, deslocamento=0):
+        """Uma página de expositores (dicts com id, nome, segmento e descricao), por nome."""
+        condicao, parametros = self._filtro(evento_id, pesquisa, segmento)
+        linhas = self._conexao().execute(
+            f"""SELECT e.id, e.nome, e.descricao,
+                       (SELECT group_concat(segmento, '|') FROM expositor_segmentos s WHERE s.expositor_id = e.id)
+                FROM expositores e WHERE {condicao}
+                ORDER BY e.nome_busca LIMIT ? OFFSET ?""",
+            [*parametros, limite, deslocamento],
+        ).fetchall()
+        return [
+            {'id': id_, 'nome': nome, 'segmento': sorted(segmentos.split('|')) if segmentos else [], 'descricao': descricao}
+            for id_, nome, descricao, segmentos in linhas
+        ]
@@ -0,0 +1,133 @@
+"""Índices de filtro pré-calculados: bitmaps por valor e identificadores estáveis de eventos."""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_FILTRO = ('Mes', 'UF', 'Segmento')
+# Colunas com vários valores separados por vírgula ("Pecuária, Máquinas, Agricultura Familiar")
+COLUNAS_MULTIVALOR = ('Segmento',)
+
+
+def gerar_ids_eventos(df):
+    """Identificador estável por evento, derivado de nome, datas e localização.
+
+    Eventos repetidos (mesmos três campos) recebem um sufixo pela ordem em que aparecem.
+    """
+    chaves = df['Nome'].astype(str) + '|' + df['Datas'].fillna('').astype(str) + '|' + df['Localizacao'].astype(str)
+    ids = chaves.map(lambda chave: hashlib.sha1(chave.encode('utf-8')).hexdigest()[:12])
+    ocorrencia = ids.groupby(ids).cumcount()
+    return ids.where(ocorrencia == 0, ids + '-' + ocorrencia.astype(str))
+
+
+def nomes_para_selecao(df):
+    """{evento_id: nome} para a lista de eventos; nomes repetidos são distinguidos pela localização."""
+    repetidos = df['Nome'].duplicated(keep=False)
+    return dict(zip(df['evento_id'], df['Nome'].where(~repetidos, df['Nome'] + " (" + df['Localizacao'] + ")")))
+
+
+def separar_valores(serie):
+    """Lista de valores por linha, separando as colunas multivalor por vírgula."""
+    return serie.fillna('').astype(str).str.split(',').map(lambda valores: [v.strip() for v in valores if v.strip()])
+
+
+class MotorFiltros:
+    """Filtros por bitmask sobre um dataset fixo, construído uma vez por versão dos dados.
+
+    Cada valor de `Mes`, `UF` e `Segmento` tem um bitmap (bits empacotados com
+    `np.packbits`) das linhas onde aparece. Um filtro é o OU dos bitmaps dos
+    valores escolhidos numa coluna e o E entre colunas, sem tocar no DataFrame.
+    """
+
+    def __init__(self, df, colunas=COLUNAS_FILTRO):
+        self.total = len(df)
+        self.rotulos = df.index
+        self.ids = df['evento_id'].to_numpy()
+        self._posicao_por_id = dict(zip(self.ids, range(self.total)))
+        self._categorias = {}
+        self._bitmaps = {}
+        for coluna in colunas:
+            if coluna in COLUNAS_MULTIVALOR:
+                explodido = separar_valores(df[coluna]).explode().dropna()
+                posicoes = self.rotulos.get_indexer(explodido.index)
+                codigos = pd.Categorical(explodido.to_numpy())
+            else:
+                posicoes = np.arange(self.total)
+                codigos = pd.Categorical(df[coluna].to_numpy())
+            self._categorias[coluna] = codigos.categories
+            self._bitmaps[coluna] = {
+                valor: self._empacotar(posicoes[codigos.codes == codigo])
+                for codigo, valor in enumerate(codigos.categories)
+            }
+
+    def para_arrays(self):
+        """Bitmaps de cada coluna como uma matriz (valor x bytes) e a lista dos valores."""
+        arrays = {}
+        for coluna, bitmaps in self._bitmaps.items():
+            arrays[f'{coluna}.valores'] = [str(valor) for valor in self._categorias[coluna]]
+            arrays[f'{coluna}.bitmaps'] = (
+                np.stack(list(bitmaps.values())) if bitmaps else np.zeros((0, (self.total + 7) // 8), dtype=np.uint8)
+            )
+        return arrays
+
+    @classmethod
+    def de_arrays(cls, df, arrays, colunas=COLUNAS_FILTRO):
+        """Reconstrói o motor sobre `df` a partir de `para_arrays()`, sem recalcular bitmaps."""
+        motor = cls.__new__(cls)
+        motor.total = len(df)
+        motor.rotulos = df.index
+        motor.ids = df['evento_id'].to_numpy()
+        motor._posicao_por_id = dict(zip(motor.ids, range(motor.total)))
+        motor._categorias = {}
+        motor._bitmaps = {}
+        for coluna in colunas:
+            valores = list(arrays[f'{coluna}.valores'])
+            motor._categorias[coluna] = pd.Index(valores)
+            motor._bitmaps[coluna] = dict(zip(valores, arrays[f'{coluna}.bitmaps']))
+        return motor
+
+    def _empacotar(self, posicoes):
+        bits = np.zeros(self.total, dtype=bool)
+        bits[posicoes] = True
+        return np.packbits(bits)
+
+    def _tudo(self):
+        return self._empacotar(slice(None))
+
+    def valores(self, coluna):
+        return list(self._categorias[coluna])
+
+    def bitmap_de_rotulos(self, rotulos):
+        posicoes = self.rotulos.get_indexer(rotulos)
+        return self.bitmap_de_posicoes(posicoes[posicoes >= 0])
+
+    def bitmap_de_posicoes(self, posicoes):
+        return self._empacotar(posicoes)
+
+    def mascara(self, selecoes, *bitmaps_extra):
+        """Bitmap empacotado das linhas que satisfazem todas as `selecoes` ({coluna: valores}).
+
+        Seleções vazias não filtram; `bitmaps_extra` (p. ex. de um filtro de
+        período) são intersectados com o resultado.
+        """
+        resultado = self._tudo()
+        vazio = np.zeros_like(resultado)
+        for coluna, valores in selecoes.items():
+            if not valores:
+                continue
+            bitmaps = self._bitmaps[coluna]
+            uniao = np.bitwise_or.reduce([bitmaps.get(valor, vazio) for valor in valores])
+            np.bitwise_and(resultado, uniao, out=resultado)
+        for bitmap in bitmaps_extra:
+            np.bitwise_and(resultado, bitmap, out=resultado)
+        return resultado
+
+    def booleana(self, mascara):
+        return np.unpackbits(mascara, count=self.total).astype(bool)
+
+    def posicoes(self, mascara):
+        return np.flatnonzero(np.unpackbits(mascara, count=self.total))
+
+    def posicao_de(self, evento_id):
+        """Posição do evento com `evento_id` (ou `None`), por consulta num dicionário."""
+        return self._posicao_por_id.get(evento_id)
@@ -0,0 +1,67 @@
+"""Geocodificador offline com base numa tabela de municípios brasileiros.
+
+Os centróides dos municípios vêm do GeoNames (cities500, CC-BY 4.0) e os dos estados
+de `dados/estados.csv`. Qualquer tabela com as colunas nome, uf, latitude e
+longitude (por exemplo a do IBGE) pode substituir `dados/municipios.csv`.
+"""
+import csv
+import os
+from collections import namedtuple
+
+from geocodificacao import normalizar_localizacao
+
+DIRETORIO_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+
+# Mesma interface mínima que os resultados do geopy (`.latitude`, `.longitude`)
+Coordenadas = namedtuple("Coordenadas", ["latitude", "longitude"])
+
+
+def _ler_tabela(caminho):
+    with open(caminho, encoding="utf-8", newline="") as ficheiro:
+        for linha in csv.DictReader(ficheiro):
+            yield linha["nome"], linha["uf"].strip().upper(), Coordenadas(float(linha["latitude"]), float(linha["longitude"]))
+
+
+class Gazetteer:
+    """Resolve `Cidade, UF` por consulta O(1) num índice insensível a acentos e maiúsculas.
+
+    Linhas só com o estado (p. ex. "Minas Gerais, MG") caem no centróide do estado.
+    """
+
+    def __init__(self, caminho_municipios=None, caminho_estados=None):
+        caminho_municipios = caminho_municipios or os.path.join(DIRETORIO_DADOS, "municipios.csv")
+        caminho_estados = caminho_estados or os.path.join(DIRETORIO_DADOS, "estados.csv")
+        self._municipios = {}
+        self.municipios = []
+        for nome, uf, coordenadas in _ler_tabela(caminho_municipios):
+            if (normalizar_localizacao(nome), uf) not in self._municipios:
+                self._municipios[(normalizar_localizacao(nome), uf)] = coordenadas
+                self.municipios.append(f"{nome}, {uf}")
+        self._estados = {}
+        for nome, uf, coordenadas in _ler_tabela(caminho_estados):
+            self._estados[uf] = coordenadas
+            self._estados[normalizar_localizacao(nome)] = coordenadas
+
+    def __len__(self):
+        return len(self._municipios)
+
+    def geocode(self, localizacao):
+        """Devolve `Coordenadas` ou `None`, tal como `Nominatim.geocode`."""
+        cidade, _, uf = str(localizacao).rpartition(",")
+        if not cidade:
+            cidade, uf = uf, ""
+        cidade = normalizar_localizacao(cidade)
+        uf = uf.strip().upper()
+        coordenadas = self._municipios.get((cidade, uf))
+        if coordenadas is None and cidade in self._estados and (not uf or self._estados[cidade] == self._estados.get(uf)):
+            coordenadas = self._estados[cidade]
+        return coordenadas
+
+    def geocodificar_varios(self, localizacoes):
+        """Resolve várias localizações de uma vez; as não encontradas ficam de fora."""
+        resultado = {}
+        for localizacao in dict.fromkeys(localizacoes):
+            coordenadas = self.geocode(localizacao)
+            if coordenadas is not None:
+                resultado[localizacao] = (coordenadas.latitude, coordenadas.longitude)
+        return resultado
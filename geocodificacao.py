@@ -0,0 +1,389 @@
+"""Geocodificação das localizações dos eventos com cache persistente em disco."""
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metricas
+
+CAMINHO_CACHE_PADRAO = os.environ.get(
+    "DASHBOARD_GEOCACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "geocode.sqlite")
+)
+# Resultados positivos raramente mudam; os negativos voltam a ser tentados mais cedo
+TTL_POSITIVO = 180 * 24 * 3600
+TTL_NEGATIVO = 7 * 24 * 3600
+
+ESTADO_OK = "ok"
+ESTADO_NAO_ENCONTRADO = "nao_encontrado"
+# Estados que só existem nos resultados em fluxo (nunca são guardados no cache)
+ESTADO_CACHE = "cache"
+ESTADO_FALHA = "falha"
+
+ResultadoGeocodificacao = namedtuple("ResultadoGeocodificacao", ["localizacao", "coordenadas", "estado"])
+
+
+def normalizar_localizacao(texto):
+    """Chave canónica de uma localização: sem acentos, minúsculas e espaços colapsados."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().replace(",", " , ").split()).replace(" ,", ",")
+
+
+class GeocodeCache:
+    """Cache SQLite de geocodificação, seguro para vários processos do Streamlit.
+
+    Cada chave guarda um resultado positivo (coordenadas) ou negativo (localização
+    não encontrada), cada um com o seu TTL. Erros de rede não são guardados.
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE_PADRAO, ttl_positivo=TTL_POSITIVO, ttl_negativo=TTL_NEGATIVO):
+        self.caminho = caminho
+        self.ttl_positivo = ttl_positivo
+        self.ttl_negativo = ttl_negativo
+        self.hits = 0
+        self.misses = 0
+        # Os contadores são atualizados pelas threads do trabalho de geocodificação e pelas sessões
+        self._lock_contadores = threading.Lock()
+        self._local = threading.local()
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._criar_tabela()
+
+    def _conexao(self):
+        # Uma ligação por thread: o Streamlit executa cada sessão numa thread própria
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            if self.caminho != ":memory:":
+                conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA busy_timeout=30000")
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar_tabela(self):
+        with self._conexao() as conexao:
+            conexao.execute(
+                """CREATE TABLE IF NOT EXISTS geocode (
+                    chave TEXT PRIMARY KEY,
+                    localizacao TEXT NOT NULL,
+                    latitude REAL,
+                    longitude REAL,
+                    estado TEXT NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )"""
+            )
+
+    def obter_varios(self, chaves):
+        """Devolve {chave: (lat, lon) ou None} para as chaves válidas em cache.
+
+        `None` indica um resultado negativo ainda dentro do TTL; chaves ausentes ou
+        expiradas não aparecem no resultado.
+        """
+        chaves = list(dict.fromkeys(chaves))
+        agora = time.time()
+        resultado = {}
+        conexao = self._conexao()
+        # Lotes abaixo do limite de parâmetros do SQLite
+        for inicio in range(0, len(chaves), 500):
+            lote = chaves[inicio:inicio + 500]
+            marcadores = ",".join("?" * len(lote))
+            linhas = conexao.execute(
+                f"SELECT chave, latitude, longitude, estado, atualizado_em FROM geocode WHERE chave IN ({marcadores})",
+                lote,
+            ).fetchall()
+            for chave, latitude, longitude, estado, atualizado_em in linhas:
+                ttl = self.ttl_positivo if estado == ESTADO_OK else self.ttl_negativo
+                if agora - atualizado_em > ttl:
+                    continue
+                resultado[chave] = (latitude, longitude) if estado == ESTADO_OK else None
+        with self._lock_contadores:
+            self.hits += len(resultado)
+            self.misses += len(chaves) - len(resultado)
+        return resultado
+
+    def guardar(self, chave, localizacao, coordenadas):
+        """Guarda um resultado positivo (`coordenadas`) ou negativo (`None`)."""
+        self.guardar_varios([(chave, localizacao, coordenadas)])
+
+    def guardar_varios(self, resultados):
+        agora = time.time()
+        linhas = [
+            (
+                chave,
+                localizacao,
+                coordenadas[0] if coordenadas else None,
+                coordenadas[1] if coordenadas else None,
+                ESTADO_OK if coordenadas else ESTADO_NAO_ENCONTRADO,
+                agora,
+            )
+            for chave, localizacao, coordenadas in resultados
+        ]
+        with self._conexao() as conexao:
+            conexao.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?)", linhas)
+
+    def limpar_expirados(self):
+        """Apaga as entradas fora do TTL, que já não são devolvidas por `obter_varios`."""
+        agora = time.time()
+        with self._conexao() as conexao:
+            conexao.execute(
+                "DELETE FROM geocode WHERE (estado = ? AND ? - atualizado_em > ?) OR (estado != ? AND ? - atualizado_em > ?)",
+                (ESTADO_OK, agora, self.ttl_positivo, ESTADO_OK, agora, self.ttl_negativo),
+            )
+
+
+class TokenBucket:
+    """Limitador de taxa partilhado entre threads: `taxa` pedidos/s com rajadas até `capacidade`."""
+
+    def __init__(self, taxa, capacidade=1):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+
+def _consultar(geolocator, localizacao, limitador, tentativas, backoff, timeout):
+    for tentativa in range(tentativas):
+        limitador.adquirir()
+        try:
+            return geolocator.geocode(localizacao, timeout=timeout)
+        except Exception:
+            if tentativa == tentativas - 1:
+                raise
+            time.sleep(backoff * 2 ** tentativa)
+
+
+def geocodificar_em_fluxo(
+    localizacoes, geolocator, cache, taxa=1.0, trabalhadores=4, tentativas=3, backoff=1.0, timeout=10, limitador=None
+):
+    """Gera um `ResultadoGeocodificacao` por localização, à medida que ficam resolvidas.
+
+    Cada localização distinta (após normalização) é consultada no máximo uma vez. Os
+    acertos no cache saem logo; as restantes são pedidas ao `geolocator` em paralelo,
+    limitadas a `taxa` pedidos/s (ou pelo `limitador` dado, partilhado com outros
+    fluxos), com `timeout` por pedido e até `tentativas` com backoff exponencial.
+    Falhas saem com estado `falha` e não são guardadas no cache.
+    """
+    por_chave = {}
+    for localizacao in dict.fromkeys(localizacoes):
+        por_chave.setdefault(normalizar_localizacao(localizacao), []).append(localizacao)
+
+    em_cache = cache.obter_varios(por_chave)
+    for chave, coordenadas in em_cache.items():
+        estado = ESTADO_CACHE if coordenadas else ESTADO_NAO_ENCONTRADO
+        for localizacao in por_chave[chave]:
+            yield ResultadoGeocodificacao(localizacao, coordenadas, estado)
+
+    pendentes = [chave for chave in por_chave if chave not in em_cache]
+    if not pendentes:
+        return
+    limitador = limitador or TokenBucket(taxa)
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        futuros = {
+            executor.submit(_consultar, geolocator, por_chave[chave][0], limitador, tentativas, backoff, timeout): chave
+            for chave in pendentes
+        }
+        for futuro in as_completed(futuros):
+            chave = futuros[futuro]
+            try:
+                location_data = futuro.result()
+            except Exception:
+                coordenadas, estado = None, ESTADO_FALHA
+            else:
+                coordenadas = (location_data.latitude, location_data.longitude) if location_data else None
+                estado = ESTADO_OK if coordenadas else ESTADO_NAO_ENCONTRADO
+                cache.guardar(chave, por_chave[chave][0], coordenadas)
+            for localizacao in por_chave[chave]:
+                yield ResultadoGeocodificacao(localizacao, coordenadas, estado)
+
+
+def geocodificar_localizacoes(localizacoes, geolocator, cache, **opcoes):
+    """Versão bloqueante de `geocodificar_em_fluxo`: devolve {localizacao: (lat, lon)}."""
+    return {
+        resultado.localizacao: resultado.coordenadas
+        for resultado in geocodificar_em_fluxo(localizacoes, geolocator, cache, **opcoes)
+        if resultado.coordenadas
+    }
+
+
+class TrabalhoGeocodificacao:
+    """Executa `geocodificar_em_fluxo` numa thread de fundo e expõe os resultados parciais."""
+
+    def __init__(self, localizacoes, geolocator, cache, **opcoes):
+        self.localizacoes = tuple(dict.fromkeys(localizacoes))
+        self._geolocator = geolocator
+        self._cache = cache
+        self._opcoes = opcoes
+        self._coordenadas = {}
+        self._estados = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._executar, name="geocodificacao", daemon=True)
+        self.concluido_em = None
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def aguardar(self, timeout=None):
+        self._thread.join(timeout)
+        return self
+
+    def _executar(self):
+        try:
+            for resultado in geocodificar_em_fluxo(self.localizacoes, self._geolocator, self._cache, **self._opcoes):
+                with self._lock:
+                    self._estados[resultado.localizacao] = resultado.estado
+                    if resultado.coordenadas:
+                        self._coordenadas[resultado.localizacao] = resultado.coordenadas
+        finally:
+            with self._lock:
+                for localizacao in self.localizacoes:
+                    self._estados.setdefault(localizacao, ESTADO_FALHA)
+                self.concluido_em = time.time()
+
+    @property
+    def concluido(self):
+        return not self._thread.is_alive() and len(self._estados) == len(self.localizacoes)
+
+    def resultados(self):
+        with self._lock:
+            return dict(self._coordenadas)
+
+    def repetir_falhas(self, intervalo):
+        """`True` se terminou com falhas (erros de rede ou do serviço) há mais de `intervalo` segundos."""
+        with self._lock:
+            if self.concluido_em is None or ESTADO_FALHA not in self._estados.values():
+                return False
+            return time.time() - self.concluido_em > intervalo
+
+    def estados(self):
+        with self._lock:
+            return dict(self._estados)
+
+    def relatorio(self):
+        """Contagem por estado, mais `pendentes`, e as localizações que ficaram sem coordenadas."""
+        return _relatorio(self.localizacoes, self.estados())
+
+
+def _relatorio(localizacoes, estados):
+    contagem = Counter(estados.values())
+    contagem["pendentes"] = len(localizacoes) - len(estados)
+    nao_resolvidas = sorted(
+        localizacao for localizacao, estado in estados.items() if estado in (ESTADO_NAO_ENCONTRADO, ESTADO_FALHA)
+    )
+    return dict(contagem), nao_resolvidas
+
+
+class TrabalhosCombinados:
+    """Vista de vários `TrabalhoGeocodificacao` restrita a `localizacoes`, com a mesma interface de leitura."""
+
+    def __init__(self, localizacoes, trabalhos):
+        self.localizacoes = tuple(dict.fromkeys(localizacoes))
+        self._trabalhos = trabalhos
+
+    @property
+    def concluido(self):
+        return all(trabalho.concluido for trabalho in self._trabalhos)
+
+    def aguardar(self, timeout=None):
+        for trabalho in self._trabalhos:
+            trabalho.aguardar(timeout)
+        return self
+
+    def resultados(self):
+        resultados = {}
+        for trabalho in self._trabalhos:
+            resultados.update(trabalho.resultados())
+        return {localizacao: resultados[localizacao] for localizacao in self.localizacoes if localizacao in resultados}
+
+    def repetir_falhas(self, intervalo):
+        return any(trabalho.repetir_falhas(intervalo) for trabalho in self._trabalhos)
+
+    def relatorio(self):
+        estados = {}
+        for trabalho in self._trabalhos:
+            estados.update(trabalho.estados())
+        return _relatorio(
+            self.localizacoes,
+            {localizacao: estados[localizacao] for localizacao in self.localizacoes if localizacao in estados},
+        )
+
+
+class GeocodificacaoEmFundo:
+    """Trabalhos de geocodificação de um processo, com um único limite de pedidos/s.
+
+    Cada pedido só inicia um trabalho para as localizações que nenhum trabalho
+    conhecido cobre; as que já estão em curso (ou resolvidas) são lidas desse
+    trabalho. Assim, reconstruções sucessivas com conjuntos de pendentes diferentes
+    nunca voltam a consultar a mesma localização nem somam taxas.
+    """
+
+    def __init__(self, geolocator, cache, taxa=1.0, intervalo_nova_tentativa=15 * 60, **opcoes):
+        self._geolocator = geolocator
+        self._cache = cache
+        self._limitador = TokenBucket(taxa)
+        self._intervalo_nova_tentativa = intervalo_nova_tentativa
+        self._opcoes = opcoes
+        self._trabalhos = []
+        self._lock = threading.Lock()
+
+    def pedir(self, localizacoes):
+        """`TrabalhosCombinados` com os resultados (parciais) para `localizacoes`."""
+        pedidas = set(localizacoes)
+        with self._lock:
+            # Terminados com falhas há tempo suficiente deixam de cobrir as suas localizações,
+            # e os terminados que já não interessam a nenhum pedido são esquecidos
+            self._trabalhos = [
+                trabalho for trabalho in self._trabalhos
+                if not trabalho.repetir_falhas(self._intervalo_nova_tentativa)
+                and (not trabalho.concluido or not pedidas.isdisjoint(trabalho.localizacoes))
+            ]
+            cobertas = {localizacao for trabalho in self._trabalhos for localizacao in trabalho.localizacoes}
+            novas = [localizacao for localizacao in dict.fromkeys(localizacoes) if localizacao not in cobertas]
+            if novas:
+                self._trabalhos.append(TrabalhoGeocodificacao(
+                    novas, self._geolocator, self._cache, limitador=self._limitador, **self._opcoes
+                ).iniciar())
+            trabalhos = [trabalho for trabalho in self._trabalhos if not pedidas.isdisjoint(trabalho.localizacoes)]
+        return TrabalhosCombinados(localizacoes, trabalhos)
+
+
+def geocodificar_dataframe(df, gazetteer, remoto=None, cache=None):
+    """Preenche Latitude/Longitude em `df` e devolve as localizações que ficaram por resolver.
+
+    O `gazetteer` resolve o que puder e a `cache` (se houver) é lida de imediato; só as
+    restantes são passadas a `remoto(pendentes)`, que devolve {localizacao: (lat, lon)}
+    com o que já conseguiu resolver.
+    """
+    localizacoes = df['Localizacao'].unique()
+    coordenadas = gazetteer.geocodificar_varios(localizacoes)
+    pendentes = tuple(localizacao for localizacao in localizacoes if localizacao not in coordenadas)
+    metricas.contar_cache('gazetteer', acertos=len(coordenadas), falhas=len(pendentes))
+    if pendentes and cache is not None:
+        chaves = {localizacao: normalizar_localizacao(localizacao) for localizacao in pendentes}
+        em_cache = cache.obter_varios(chaves.values())
+        # Negativos ainda válidos também contam como resolvidos: não vale a pena voltar a pedir
+        coordenadas.update(
+            (localizacao, em_cache[chave]) for localizacao, chave in chaves.items() if em_cache.get(chave)
+        )
+        pendentes = tuple(localizacao for localizacao, chave in chaves.items() if chave not in em_cache)
+    if pendentes and remoto is not None:
+        coordenadas.update(remoto(pendentes))
+    df['Latitude'] = df['Localizacao'].map(lambda x: coordenadas.get(x, (None, None))[0]).astype('float64')
+    df['Longitude'] = df['Localizacao'].map(lambda x: coordenadas.get(x, (None, None))[1]).astype('float64')
+    return [localizacao for localizacao in localizacoes if localizacao not in coordenadas]
@@ -0,0 +1,182 @@
+"""Leitura incremental dos eventos a partir de um diretório de ficheiros CSV/Excel/Parquet."""
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from datas import interpretar_datas
+from filtros import gerar_ids_eventos
+
+DIRETORIO_EVENTOS = os.environ.get(
+    "DASHBOARD_EVENTOS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "eventos")
+)
+EXTENSOES = ('.csv', '.xlsx', '.xls', '.parquet')
+COLUNAS_OBRIGATORIAS = ['Mês', 'Evento', 'Foco', 'Data', 'Cidade', 'UF']
+
+
+class ErroEsquema(ValueError):
+    """Um ficheiro de eventos não tem o formato esperado."""
+
+
+def ler_ficheiro_eventos(caminho):
+    if caminho.endswith('.parquet'):
+        df = pd.read_parquet(caminho)
+    elif caminho.endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(caminho, dtype=str)
+    else:
+        df = pd.read_csv(caminho, dtype=str)
+    validar_esquema(df, os.path.basename(caminho))
+    return df
+
+
+def validar_esquema(df, origem):
+    em_falta = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in df.columns]
+    if em_falta:
+        raise ErroEsquema(f"{origem}: colunas em falta: {', '.join(em_falta)}")
+    uf = df['UF'].dropna().astype(str).str.strip()
+    invalidas = sorted(set(uf[~uf.str.fullmatch(r'[A-Za-z]{2}')]))
+    if invalidas:
+        raise ErroEsquema(f"{origem}: UF inválida: {', '.join(invalidas[:5])}")
+
+
+def limpar_eventos(df):
+    """Limpeza de um ficheiro de eventos: normaliza colunas, datas e gera os `evento_id`."""
+    df = df[COLUNAS_OBRIGATORIAS].astype(object).where(df[COLUNAS_OBRIGATORIAS].notna(), None)
+    df['Cidade'] = df['Cidade'].str.strip()
+    df['UF'] = df['UF'].str.strip().str.upper()
+    df = df.dropna(subset=['Evento', 'Cidade', 'UF'])
+    df = df[~df['Cidade'].str.contains('A definir|Online', na=False)].copy()
+    df['Mês'] = df['Mês'].ffill()
+    df['Localizacao'] = df['Cidade'] + ', ' + df['UF']
+    df.rename(columns={'Mês': 'Mes', 'Evento': 'Nome', 'Foco': 'Segmento', 'Data': 'Datas'}, inplace=True)
+    df = interpretar_datas(df)
+    df['evento_id'] = gerar_ids_eventos(df)
+    df['Latitude'] = np.nan
+    df['Longitude'] = np.nan
+    return df.reset_index()
+
+
+def hash_ficheiro(caminho):
+    with open(caminho, 'rb') as ficheiro:
+        return hashlib.sha1(ficheiro.read()).hexdigest()
+
+
+def _desambiguar_ids(ids):
+    # Eventos iguais em ficheiros diferentes: sufixo pela ordem de aparecimento
+    repetidos = ids.duplicated(keep='first')
+    if not repetidos.any():
+        return ids
+    ocorrencia = ids.groupby(ids).cumcount()
+    return ids.where(~repetidos, ids + '~' + ocorrencia.astype(str))
+
+
+class CatalogoEventos:
+    """Catálogo de eventos montado a partir dos ficheiros de um diretório.
+
+    Cada ficheiro é identificado pelo hash do seu conteúdo; numa atualização só os
+    ficheiros novos ou alterados são relidos, validados e limpos, e os restantes
+    reaproveitam as linhas já limpas (incluindo as coordenadas já obtidas). Um
+    ficheiro inválido é ignorado, mantendo-se a última versão válida, e o erro
+    fica em `erros`.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_EVENTOS):
+        self.diretorio = diretorio
+        self.erros = {}
+        self.ultimas_alteracoes = {}
+        self._ficheiros = {}
+        self._assinatura = None
+        self._lock = threading.Lock()
+
+    def _caminhos(self):
+        return sorted(c for c in glob.glob(os.path.join(self.diretorio, '*')) if c.endswith(EXTENSOES))
+
+    def _assinatura_atual(self):
+        assinatura = []
+        for caminho in self._caminhos():
+            estado = os.stat(caminho)
+            assinatura.append((caminho, estado.st_size, estado.st_mtime_ns))
+        return tuple(assinatura)
+
+    def hashes(self):
+        """Hash do conteúdo de cada ficheiro atualmente no diretório, por origem."""
+        return {os.path.basename(caminho): hash_ficheiro(caminho) for caminho in self._caminhos()}
+
+    def ha_alteracoes(self):
+        """Verificação barata (nomes, tamanhos e datas de modificação) antes de calcular hashes."""
+        return self._assinatura_atual() != self._assinatura
+
+    def atualizar(self):
+        """Relê o que mudou e devolve o catálogo completo (DataFrame novo, com coluna `origem`)."""
+        with self._lock:
+            assinatura = self._assinatura_atual()
+            alteracoes = {'novos': [], 'alterados': [], 'removidos': [], 'inalterados': []}
+            origens = {os.path.basename(caminho): caminho for caminho, _, _ in assinatura}
+            for origem in set(self._ficheiros) - set(origens):
+                del self._ficheiros[origem]
+                alteracoes['removidos'].append(origem)
+            # Dicionário novo, trocado de uma vez no fim: quem lê `erros` sem o lock nunca o vê a meio
+            erros = {origem: erro for origem, erro in self.erros.items() if origem in origens}
+            for origem, caminho in origens.items():
+                hash_conteudo = hash_ficheiro(caminho)
+                anterior = self._ficheiros.get(origem)
+                if anterior is not None and anterior['hash'] == hash_conteudo:
+                    alteracoes['inalterados'].append(origem)
+                    continue
+                try:
+                    df = limpar_eventos(ler_ficheiro_eventos(caminho))
+                except Exception as erro:
+                    erros[origem] = str(erro)
+                    continue
+                erros.pop(origem, None)
+                df['origem'] = origem
+                self._ficheiros[origem] = {'hash': hash_conteudo, 'df': df}
+                alteracoes['alterados' if anterior is not None else 'novos'].append(origem)
+            self._assinatura = assinatura
+            self.erros = erros
+            self.ultimas_alteracoes = alteracoes
+            return self._juntar()
+
+    def semear(self, df, hashes, erros=None):
+        """Adota um catálogo já limpo (p. ex. de um snapshot) como estado atual.
+
+        `hashes` são os hashes dos ficheiros de onde `df` veio; só deve ser usado
+        quando coincidem com os ficheiros atuais, para que a próxima atualização
+        releia apenas o que mudar a partir daqui.
+        """
+        with self._lock:
+            self._ficheiros = {
+                origem: {
+                    'hash': hashes[origem],
+                    # Cada ficheiro guarda os ids antes da desambiguação entre ficheiros
+                    'df': parte.assign(evento_id=parte['evento_id'].str.replace(r'~\d+$', '', regex=True)).reset_index(drop=True),
+                }
+                for origem, parte in df.groupby('origem', sort=False)
+            }
+            self.erros = dict(erros or {})
+            self._assinatura = self._assinatura_atual()
+
+    def _juntar(self):
+        partes = [self._ficheiros[origem]['df'] for origem in sorted(self._ficheiros)]
+        if not partes:
+            return limpar_eventos(pd.DataFrame(columns=COLUNAS_OBRIGATORIAS)).assign(origem=pd.Series(dtype=object))
+        df = pd.concat(partes, ignore_index=True)
+        df['evento_id'] = _desambiguar_ids(df['evento_id'])
+        return df
+
+    def registar_coordenadas(self, df):
+        """Guarda, por ficheiro, as coordenadas obtidas para as linhas de `df`."""
+        with self._lock:
+            for origem, parte in df.groupby('origem', sort=False):
+                registo = self._ficheiros.get(origem)
+                # O ficheiro pode ter sido relido entretanto; só se aplica à mesma versão
+                if registo is None or len(registo['df']) != len(parte):
+                    continue
+                if not (registo['df']['Localizacao'].to_numpy() == parte['Localizacao'].to_numpy()).all():
+                    continue
+                registo['df'] = registo['df'].assign(
+                    Latitude=parte['Latitude'].to_numpy(), Longitude=parte['Longitude'].to_numpy()
+                )
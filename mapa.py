@@ -0,0 +1,203 @@
+"""Construção do mapa: mapa base estático e camadas de eventos numa única estrutura."""
+import html
+import json
+import math
+
+import folium
+import numpy as np
+from folium.plugins import FastMarkerCluster
+
+CENTRO_BRASIL = [-14.2350, -51.9253]
+ZOOM_BRASIL = 4
+ZOOM_EVENTO = 12
+COR_EVENTO = "#2ECC71"
+COR_SELECIONADO = "red"
+# A partir deste número de pontos o agrupamento no browser fica ligado por omissão
+LIMITE_AGRUPAMENTO = 500
+# Modo por área visível: até estes zooms enviam-se contagens por UF / por cidade
+ZOOM_MAXIMO_UF = 5
+ZOOM_MAXIMO_CIDADE = 7
+# Acima deste número de pontos na área visível, volta-se às contagens por cidade
+LIMITE_PONTOS_VIEWPORT = 2000
+MARGEM_VIEWPORT = 0.25
+
+_CALLBACK_AGRUPAMENTO = f"""
+function (row) {{
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {{
+        radius: 8, color: '{COR_EVENTO}', fill: true, fillColor: '{COR_EVENTO}', fillOpacity: 0.4
+    }});
+    marker.bindTooltip(row[2]);
+    marker.bindPopup('<b>' + row[2] + '</b><br>' + row[3]);
+    return marker;
+}};
+"""
+
+
+def criar_mapa_base():
+    """Mapa sem eventos: os pontos entram como camadas dinâmicas do `st_folium`."""
+    m = folium.Map(location=CENTRO_BRASIL, zoom_start=ZOOM_BRASIL, tiles="CartoDB dark_matter")
+    m.get_root().html.add_child(folium.Element("<style>.leaflet-control-attribution {display: none !important;}</style>"))
+    return m
+
+
+def _pontos(df):
+    return zip(
+        df['Latitude'].to_numpy(),
+        df['Longitude'].to_numpy(),
+        df['Nome'].map(html.escape),
+        (df['Cidade'] + ', ' + df['UF']).map(html.escape),
+    )
+
+
+def dados_eventos(df, agrupar=False):
+    """Dados de uma camada com todos os eventos do `df`: pontos para o FastMarkerCluster ou GeoJSON.
+
+    Só estruturas simples (listas e dicionários), que podem ser memorizadas e
+    partilhadas; os objetos do folium são criados por `camada_de_dados` em cada render.
+    """
+    if agrupar:
+        return 'agrupado', [[float(lat), float(lon), nome, local] for lat, lon, nome, local in _pontos(df)]
+    return 'geojson', {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+                "properties": {"nome": nome, "local": local},
+            }
+            for lat, lon, nome, local in _pontos(df)
+        ],
+    }
+
+
+def camada_de_dados(dados):
+    """FeatureGroup novo a partir do que `dados_eventos` ou `dados_agregados` devolvem."""
+    tipo, conteudo = dados
+    camada = folium.FeatureGroup(name="Eventos")
+    if tipo == 'agrupado':
+        FastMarkerCluster(data=conteudo, callback=_CALLBACK_AGRUPAMENTO).add_to(camada)
+    elif tipo == 'geojson' and conteudo["features"]:
+        folium.GeoJson(
+            conteudo,
+            marker=folium.CircleMarker(radius=8, color=COR_EVENTO, fill=True, fill_color=COR_EVENTO, fill_opacity=0.4),
+            tooltip=folium.GeoJsonTooltip(fields=["nome"], labels=False),
+            popup=folium.GeoJsonPopup(fields=["nome", "local"], labels=False),
+        ).add_to(camada)
+    elif tipo == 'agregado':
+        for texto, raio, latitude, longitude in conteudo:
+            folium.CircleMarker(
+                location=[latitude, longitude],
+                radius=raio,
+                color=COR_EVENTO,
+                fill=True,
+                fill_color=COR_EVENTO,
+                fill_opacity=0.4,
+                tooltip=texto,
+            ).add_to(camada)
+    return camada
+
+
+def camada_eventos(df, agrupar=False):
+    """Todos os eventos do `df` numa só camada: GeoJSON ou FastMarkerCluster (agrupado no browser)."""
+    return camada_de_dados(dados_eventos(df, agrupar))
+
+
+def camada_selecao(linha):
+    """Camada com um único marcador para o evento em destaque (ou vazia)."""
+    camada = folium.FeatureGroup(name="Selecionado")
+    if linha is not None:
+        folium.CircleMarker(
+            location=[linha['Latitude'], linha['Longitude']],
+            radius=8,
+            color=COR_SELECIONADO,
+            fill=True,
+            fill_color=COR_SELECIONADO,
+            fill_opacity=0.7,
+            popup=f"<b>{html.escape(linha['Nome'])}</b><br>{html.escape(linha['Cidade'])}, {html.escape(linha['UF'])}",
+            tooltip=html.escape(linha['Nome']),
+        ).add_to(camada)
+    return camada
+
+
+def medir_dados(dados):
+    """(marcadores, bytes) dos dados de uma camada, tal como seguem para o browser."""
+    tipo, conteudo = dados
+    marcadores = len(conteudo["features"]) if tipo == 'geojson' else len(conteudo)
+    return marcadores, len(json.dumps(conteudo))
+
+
+def limites_viewport(bounds, zoom, margem=MARGEM_VIEWPORT):
+    """Converte os `bounds` do `st_folium` em (sul, oeste, norte, leste) com margem.
+
+    Os limites são alargados para fora até uma grelha que depende do zoom, para que
+    pequenos deslocamentos do mapa reutilizem a mesma camada memorizada. Sem
+    `bounds` (primeiro render) devolve `None`, que significa "sem recorte".
+    """
+    if not bounds or not bounds.get('_southWest') or not bounds.get('_northEast'):
+        return None
+    sul, oeste = bounds['_southWest']['lat'], bounds['_southWest']['lng']
+    norte, leste = bounds['_northEast']['lat'], bounds['_northEast']['lng']
+    margem_lat = (norte - sul) * margem
+    margem_lon = (leste - oeste) * margem
+    passo = 360 / 2 ** max(int(zoom or 0), 0)
+    return (
+        max(math.floor((sul - margem_lat) / passo) * passo, -90.0),
+        math.floor((oeste - margem_lon) / passo) * passo,
+        min(math.ceil((norte + margem_lat) / passo) * passo, 90.0),
+        math.ceil((leste + margem_lon) / passo) * passo,
+    )
+
+
+def dentro_dos_limites(df, limites):
+    """Máscara booleana das linhas dentro de (sul, oeste, norte, leste)."""
+    if limites is None:
+        return np.ones(len(df), dtype=bool)
+    sul, oeste, norte, leste = limites
+    latitude = df['Latitude'].to_numpy()
+    longitude = df['Longitude'].to_numpy()
+    return (latitude >= sul) & (latitude <= norte) & (longitude >= oeste) & (longitude <= leste)
+
+
+def agregar_eventos(df, coluna):
+    """Uma linha por valor de `coluna` com a quantidade de eventos e o centróide dos pontos."""
+    return (
+        df.groupby(coluna, sort=False)
+        .agg(quantidade=('Nome', 'size'), Latitude=('Latitude', 'mean'), Longitude=('Longitude', 'mean'))
+        .reset_index()
+    )
+
+
+def dados_agregados(agregados, coluna):
+    """Um círculo por região, com raio proporcional à raiz da quantidade de eventos."""
+    return 'agregado', [
+        (
+            f"{html.escape(str(regiao))}: {quantidade} evento{'s' if quantidade != 1 else ''}",
+            6 + 3 * math.sqrt(quantidade), float(latitude), float(longitude),
+        )
+        for regiao, quantidade, latitude, longitude in agregados[[coluna, 'quantidade', 'Latitude', 'Longitude']].itertuples(index=False)
+    ]
+
+
+def dados_viewport(df, limites, zoom, agrupar=False, agregados_uf=None):
+    """Dados da camada só com o que está na área visível e descrição do que foi enviado.
+
+    Em zoom baixo envia contagens por UF ou por cidade em vez de pontos; em zoom alto
+    envia os eventos dentro de `limites`, até `LIMITE_PONTOS_VIEWPORT`. Os
+    `agregados_uf` já calculados (p. ex. do cubo de contagens) evitam percorrer o
+    `df` no zoom por UF, onde a área visível cobre praticamente o país inteiro.
+    """
+    if zoom <= ZOOM_MAXIMO_UF and agregados_uf is not None:
+        return dados_agregados(agregados_uf, 'UF'), f"{int(agregados_uf['quantidade'].sum())} eventos agregados por UF"
+    visiveis = df[dentro_dos_limites(df, limites)]
+    if zoom <= ZOOM_MAXIMO_UF:
+        return dados_agregados(agregar_eventos(visiveis, 'UF'), 'UF'), f"{len(visiveis)} eventos agregados por UF"
+    if zoom <= ZOOM_MAXIMO_CIDADE or len(visiveis) > LIMITE_PONTOS_VIEWPORT:
+        agregados = agregar_eventos(visiveis, 'Localizacao')
+        return dados_agregados(agregados, 'Localizacao'), f"{len(visiveis)} eventos agregados por cidade"
+    return dados_eventos(visiveis, agrupar), f"{len(visiveis)} de {len(df)} eventos na área visível"
+
+
+def camada_viewport(df, limites, zoom, agrupar=False, agregados_uf=None):
+    """Como `dados_viewport`, mas já com a camada do folium."""
+    dados, descricao = dados_viewport(df, limites, zoom, agrupar, agregados_uf)
+    return camada_de_dados(dados), descricao
@@ -0,0 +1,253 @@
+"""Instrumentação leve: tempos por fase de cada rerun, contagens e acertos de cache.
+
+Um `Perfil` junta o que acontece num rerun (ou numa reconstrução dos dados). Enquanto
+está ativo, `medir`, `registar`, `acesso_cache` e `contar_cache` escrevem nele; fora de um perfil
+não fazem nada, por isso o código instrumentado pode correr em qualquer contexto.
+O `RegistoMetricas` do processo agrega os perfis e exporta-os em JSON lines (com
+rotação por tamanho) e num ficheiro de texto no formato do Prometheus, um por
+processo, para o textfile collector.
+"""
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+DIRETORIO_METRICAS = os.environ.get(
+    "DASHBOARD_METRICAS", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "metricas")
+)
+# Perfis guardados por tipo para os percentis e para o painel
+HISTORICO = 500
+# Acima deste tamanho o perfis.jsonl passa a perfis.jsonl.1 (substituindo o anterior)
+TAMANHO_MAXIMO_JSONL = 20 * 1024 ** 2
+
+_perfil_atual = contextvars.ContextVar("perfil_atual", default=None)
+
+
+class Perfil:
+    """Fases (segundos), valores (contagens, bytes) e acessos a caches de uma execução."""
+
+    def __init__(self, tipo="rerun"):
+        self.tipo = tipo
+        self.inicio = time.time()
+        self.duracao = None
+        self.fases = {}
+        self.valores = {}
+        self.caches = {}
+        self._falhas = set()
+
+    @contextmanager
+    def ativo(self):
+        token = _perfil_atual.set(self)
+        comeco = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.duracao = time.perf_counter() - comeco
+            _perfil_atual.reset(token)
+
+    def para_dict(self):
+        return {
+            'tipo': self.tipo, 'inicio': round(self.inicio, 3), 'duracao': self.duracao,
+            'fases': self.fases, 'valores': self.valores, 'caches': self.caches,
+        }
+
+
+@contextmanager
+def medir(fase):
+    """Soma ao perfil ativo o tempo passado dentro do bloco."""
+    perfil = _perfil_atual.get()
+    if perfil is None:
+        yield
+        return
+    comeco = time.perf_counter()
+    try:
+        yield
+    finally:
+        perfil.fases[fase] = perfil.fases.get(fase, 0.0) + time.perf_counter() - comeco
+
+
+def registar(**valores):
+    perfil = _perfil_atual.get()
+    if perfil is not None:
+        perfil.valores.update(valores)
+
+
+@contextmanager
+def acesso_cache(nome):
+    """Regista um acesso à cache `nome`: falha se `falha_cache(nome)` for chamado dentro do bloco.
+
+    Pensado para funções `st.cache_*`, cujo corpo só corre quando não há resultado guardado.
+    """
+    perfil = _perfil_atual.get()
+    if perfil is None:
+        yield
+        return
+    perfil._falhas.discard(nome)
+    yield
+    if nome in perfil._falhas:
+        contar_cache(nome, falhas=1)
+    else:
+        contar_cache(nome, acertos=1)
+
+
+def falha_cache(nome):
+    perfil = _perfil_atual.get()
+    if perfil is not None:
+        perfil._falhas.add(nome)
+
+
+def contar_cache(nome, acertos=0, falhas=0):
+    """Soma acertos e falhas de uma cache que não é uma função `st.cache_*` (p. ex. o gazetteer)."""
+    perfil = _perfil_atual.get()
+    if perfil is not None:
+        total_acertos, total_falhas = perfil.caches.get(nome, (0, 0))
+        perfil.caches[nome] = (total_acertos + acertos, total_falhas + falhas)
+
+
+class RegistoMetricas:
+    """Agregado, por processo, dos perfis registados; seguro entre threads."""
+
+    def __init__(self, diretorio=DIRETORIO_METRICAS, historico=HISTORICO, tamanho_maximo_jsonl=TAMANHO_MAXIMO_JSONL):
+        self.diretorio = diretorio
+        self.processo = os.getpid()
+        self._lock = threading.Lock()
+        self._perfis = {}
+        self._historico = historico
+        self._tamanho_maximo_jsonl = tamanho_maximo_jsonl
+        self._totais = {}
+        self._caches = {}
+        self._externas = {}
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            self._remover_prometheus_orfaos()
+
+    @property
+    def caminho_jsonl(self):
+        return os.path.join(self.diretorio, "perfis.jsonl") if self.diretorio else None
+
+    @property
+    def caminho_prometheus(self):
+        # Um ficheiro por processo: vários workers no mesmo diretório não se sobrepõem
+        return os.path.join(self.diretorio, f"dashboard-{self.processo}.prom") if self.diretorio else None
+
+    def _remover_prometheus_orfaos(self):
+        """Apaga os .prom de processos que já terminaram, para o collector não exportar valores parados."""
+        for caminho in glob.glob(os.path.join(self.diretorio, "dashboard-*.prom")):
+            try:
+                os.kill(int(os.path.basename(caminho)[len("dashboard-"):-len(".prom")]), 0)
+            except ValueError:
+                continue
+            except ProcessLookupError:
+                os.remove(caminho)
+            except OSError:
+                continue
+
+    def definir_cache(self, nome, acertos, falhas):
+        """Contadores mantidos fora dos perfis (p. ex. `GeocodeCache.hits`/`misses`)."""
+        with self._lock:
+            self._externas[nome] = (acertos, falhas)
+
+    def registar(self, perfil):
+        """Junta `perfil` ao agregado e acrescenta-o aos ficheiros de exportação."""
+        with self._lock:
+            self._perfis.setdefault(perfil.tipo, deque(maxlen=self._historico)).append(perfil)
+            for fase, segundos in (*perfil.fases.items(), ('total', perfil.duracao or 0.0)):
+                contagem, soma, maximo = self._totais.get((perfil.tipo, fase), (0, 0.0, 0.0))
+                self._totais[(perfil.tipo, fase)] = (contagem + 1, soma + segundos, max(maximo, segundos))
+            for nome, (acertos, falhas) in perfil.caches.items():
+                total_acertos, total_falhas = self._caches.get(nome, (0, 0))
+                self._caches[nome] = (total_acertos + acertos, total_falhas + falhas)
+            if not self.diretorio:
+                return
+            self._rodar_jsonl()
+            with open(self.caminho_jsonl, "a", encoding="utf-8") as ficheiro:
+                ficheiro.write(json.dumps({**perfil.para_dict(), 'processo': self.processo}, ensure_ascii=False) + "\n")
+            temporario = self.caminho_prometheus + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as ficheiro:
+                ficheiro.write(self._texto_prometheus())
+            os.replace(temporario, self.caminho_prometheus)
+
+    def _rodar_jsonl(self):
+        try:
+            if os.path.getsize(self.caminho_jsonl) < self._tamanho_maximo_jsonl:
+                return
+            os.replace(self.caminho_jsonl, self.caminho_jsonl + ".1")
+        except FileNotFoundError:
+            # Ainda não existe, ou outro processo acabou de o rodar
+            pass
+
+    def perfis(self, tipo="rerun"):
+        with self._lock:
+            return list(self._perfis.get(tipo, ()))
+
+    def resumo_fases(self, tipo="rerun"):
+        """Por fase: execuções, média, p50, p95 (sobre o histórico recente) e máximo, em ms."""
+        linhas = []
+        with self._lock:
+            for (tipo_fase, fase), (contagem, soma, maximo) in self._totais.items():
+                if tipo_fase != tipo:
+                    continue
+                recentes = self._recentes(tipo, fase)
+                p50, p95 = np.percentile(recentes, [50, 95]) if recentes else (0.0, 0.0)
+                linhas.append({
+                    'fase': fase, 'execucoes': contagem, 'media_ms': 1000 * soma / contagem,
+                    'p50_ms': 1000 * p50, 'p95_ms': 1000 * p95, 'max_ms': 1000 * maximo,
+                })
+        return sorted(linhas, key=lambda linha: -linha['media_ms'])
+
+    def _recentes(self, tipo, fase):
+        if fase == 'total':
+            return [perfil.duracao for perfil in self._perfis.get(tipo, ()) if perfil.duracao is not None]
+        return [perfil.fases[fase] for perfil in self._perfis.get(tipo, ()) if fase in perfil.fases]
+
+    def taxas_cache(self):
+        with self._lock:
+            caches = {**self._caches, **self._externas}
+        return [
+            {'cache': nome, 'acertos': acertos, 'falhas': falhas,
+             'taxa_acerto': acertos / (acertos + falhas) if acertos + falhas else None}
+            for nome, (acertos, falhas) in sorted(caches.items())
+        ]
+
+    def texto_prometheus(self):
+        with self._lock:
+            return self._texto_prometheus()
+
+    def _texto_prometheus(self):
+        # O rótulo do processo evita séries repetidas entre os ficheiros de vários workers
+        processo = f'processo="{self.processo}"'
+        linhas = [
+            "# HELP dashboard_fase_segundos Duração de cada fase por tipo de execução.",
+            "# TYPE dashboard_fase_segundos summary",
+        ]
+        for (tipo, fase), (contagem, soma, _) in sorted(self._totais.items()):
+            rotulos = f'{processo},tipo="{tipo}",fase="{fase}"'
+            recentes = self._recentes(tipo, fase)
+            if recentes:
+                for quantil, valor in zip((0.5, 0.95), np.percentile(recentes, [50, 95])):
+                    linhas.append(f'dashboard_fase_segundos{{{rotulos},quantile="{quantil}"}} {valor:.6f}')
+            linhas.append(f"dashboard_fase_segundos_sum{{{rotulos}}} {soma:.6f}")
+            linhas.append(f"dashboard_fase_segundos_count{{{rotulos}}} {contagem}")
+        linhas += [
+            "# HELP dashboard_cache_acessos_total Acessos às caches de dados e de geocodificação.",
+            "# TYPE dashboard_cache_acessos_total counter",
+        ]
+        for nome, (acertos, falhas) in sorted({**self._caches, **self._externas}.items()):
+            linhas.append(f'dashboard_cache_acessos_total{{{processo},cache="{nome}",resultado="acerto"}} {acertos}')
+            linhas.append(f'dashboard_cache_acessos_total{{{processo},cache="{nome}",resultado="falha"}} {falhas}')
+        ultimos = {tipo: perfis[-1] for tipo, perfis in self._perfis.items() if perfis}
+        linhas += [
+            "# HELP dashboard_valor Contagens e tamanhos da última execução de cada tipo.",
+            "# TYPE dashboard_valor gauge",
+        ]
+        for tipo, perfil in sorted(ultimos.items()):
+            for nome, valor in sorted(perfil.valores.items()):
+                if isinstance(valor, (int, float)):
+                    linhas.append(f'dashboard_valor{{{processo},tipo="{tipo}",nome="{nome}"}} {valor}')
+        return "\n".join(linhas) + "\n"
@@ -0,0 +1,149 @@
+"""Snapshot pré-compilado do dataset (Arrow + arrays NumPy), lido por memory-map no arranque.
+
+Cada snapshot fica num subdiretório versionado de `DIRETORIO_SNAPSHOT`:
+`eventos.arrow` (catálogo limpo e geocodificado, formato Arrow IPC sem compressão),
+um `.npy` por array dos índices e do cubo de contagens e um `manifesto.json` com a versão do formato e
+os hashes dos ficheiros de eventos de onde foi construído. O ficheiro `ATUAL`
+aponta para o subdiretório em uso e é trocado de forma atómica.
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from agregados import CuboContagens
+from datas import IndiceIntervalos
+from dataset import DatasetPreparado
+from espacial import IndiceEspacial
+from filtros import MotorFiltros
+
+DIRETORIO_SNAPSHOT = os.environ.get(
+    "DASHBOARD_SNAPSHOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "snapshot")
+)
+# Muda sempre que o conteúdo ou a disposição dos ficheiros deixa de ser compatível
+FORMATO = 2
+VERSOES_MANTIDAS = 2
+
+
+def _linhas_do_dataset(df_catalogo):
+    # O dataset é o catálogo sem as linhas por geocodificar, como em `construir_dados`
+    return df_catalogo.dropna(subset=['Latitude', 'Longitude'])
+
+
+def escrever_snapshot(df_catalogo, fontes, erros=None, nao_resolvidas=(), diretorio=DIRETORIO_SNAPSHOT):
+    """Constrói os índices sobre `df_catalogo` e grava um novo snapshot; devolve o manifesto."""
+    import pyarrow as pa
+
+    dataset = DatasetPreparado(_linhas_do_dataset(df_catalogo))
+    versao = f"{time.strftime('%Y%m%d-%H%M%S')}-{dataset.versao}"
+    destino = os.path.join(diretorio, versao)
+    temporario = destino + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    tabela = pa.Table.from_pandas(df_catalogo, preserve_index=True)
+    with pa.OSFile(os.path.join(temporario, "eventos.arrow"), "wb") as ficheiro:
+        with pa.ipc.new_file(ficheiro, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+
+    listas = {}
+    indices = (
+        ('datas', dataset.indice_datas), ('filtros', dataset.motor_filtros),
+        ('espacial', dataset.indice_espacial), ('cubo', dataset.cubo),
+    )
+    for nome, indice in indices:
+        listas[nome] = {}
+        for chave, valor in indice.para_arrays().items():
+            if isinstance(valor, list):
+                listas[nome][chave] = valor
+            else:
+                np.save(os.path.join(temporario, f"{nome}.{chave}.npy"), np.asarray(valor), allow_pickle=False)
+
+    manifesto = {
+        'formato': FORMATO,
+        'versao': versao,
+        'versao_dados': dataset.versao,
+        'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'fontes': fontes,
+        'erros': erros or {},
+        'nao_resolvidas': sorted(nao_resolvidas),
+        'linhas_catalogo': len(df_catalogo),
+        'eventos': len(dataset.df),
+        'listas': listas,
+    }
+    with open(os.path.join(temporario, "manifesto.json"), "w", encoding="utf-8") as ficheiro:
+        json.dump(manifesto, ficheiro, ensure_ascii=False, indent=2)
+    os.replace(temporario, destino)
+
+    ponteiro = os.path.join(diretorio, "ATUAL")
+    with open(ponteiro + ".tmp", "w", encoding="utf-8") as ficheiro:
+        ficheiro.write(versao)
+    os.replace(ponteiro + ".tmp", ponteiro)
+    _remover_versoes_antigas(diretorio, versao)
+    return manifesto
+
+
+def _remover_versoes_antigas(diretorio, atual):
+    versoes = sorted(
+        nome for nome in os.listdir(diretorio)
+        if os.path.isdir(os.path.join(diretorio, nome)) and not nome.endswith(".tmp")
+    )
+    for nome in versoes[:-VERSOES_MANTIDAS]:
+        if nome != atual:
+            shutil.rmtree(os.path.join(diretorio, nome), ignore_errors=True)
+
+
+def ler_manifesto(diretorio=DIRETORIO_SNAPSHOT):
+    """Manifesto do snapshot atual, ou `None` se não houver nenhum utilizável."""
+    try:
+        with open(os.path.join(diretorio, "ATUAL"), encoding="utf-8") as ficheiro:
+            versao = ficheiro.read().strip()
+        with open(os.path.join(diretorio, versao, "manifesto.json"), encoding="utf-8") as ficheiro:
+            manifesto = json.load(ficheiro)
+    except (OSError, ValueError):
+        return None
+    return manifesto if manifesto.get('formato') == FORMATO else None
+
+
+def carregar_snapshot(fontes_atuais, diretorio=DIRETORIO_SNAPSHOT):
+    """Devolve `(df_catalogo, dataset, manifesto)` ou `None` se faltar o snapshot ou estiver desatualizado.
+
+    Desatualizado quer dizer feito a partir de ficheiros de eventos diferentes de
+    `fontes_atuais` ({origem: hash}) ou num formato antigo. Os arrays dos índices
+    são abertos por memory-map e o catálogo por memory-map do ficheiro Arrow.
+    """
+    manifesto = ler_manifesto(diretorio)
+    if manifesto is None or manifesto['fontes'] != fontes_atuais:
+        return None
+    try:
+        import pandas as pd
+        import pyarrow as pa
+    except ImportError:
+        return None
+    pasta = os.path.join(diretorio, manifesto['versao'])
+    try:
+        with pa.memory_map(os.path.join(pasta, "eventos.arrow"), "r") as fonte:
+            # Colunas ArrowDtype ficam sobre os buffers do memory-map, sem cópia para NumPy
+            df_catalogo = pa.ipc.open_file(fonte).read_all().to_pandas(types_mapper=pd.ArrowDtype)
+        arrays = {nome: dict(listas) for nome, listas in manifesto['listas'].items()}
+        for ficheiro in os.listdir(pasta):
+            if ficheiro.endswith(".npy"):
+                nome, chave = ficheiro[:-len(".npy")].split(".", 1)
+                arrays.setdefault(nome, {})[chave] = np.load(os.path.join(pasta, ficheiro), mmap_mode="r")
+    except (OSError, ValueError, pa.ArrowException):
+        return None
+
+    df = _linhas_do_dataset(df_catalogo)
+    if len(df) != manifesto['eventos']:
+        return None
+    indices = (
+        IndiceIntervalos.de_arrays(arrays['datas']),
+        MotorFiltros.de_arrays(df, arrays['filtros']),
+        IndiceEspacial.de_arrays(arrays['espacial']),
+    )
+    cubo = CuboContagens.de_arrays(arrays['cubo'])
+    # A versão vem do manifesto: recalculá-la converteria as colunas Arrow em objetos Python
+    dataset = DatasetPreparado(df, numero=1, indices=indices, cubo=cubo, versao=manifesto['versao_dados'])
+    return df_catalogo, dataset, manifesto
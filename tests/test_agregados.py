@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregados import CuboContagens
+from datas import MESES
+
+SELECOES = [((), ()), (('Março',), ()), ((), ('SP', 'MG')), (('Março', 'Abril'), ('RS', 'GO')), (('Dezembro',), ('AM',))]
+
+
+def _catalogo(total, semente):
+    aleatorio = np.random.default_rng(semente)
+    segmentos = np.array(['Agronegócio', 'Café', 'Pecuária', 'Máquinas', 'Tecnologia'])
+    return pd.DataFrame({
+        'evento_id': [f"e{semente}-{i}" for i in range(total)],
+        'Nome': [f"Feira {i}" for i in range(total)],
+        'Mes': aleatorio.choice(MESES[:6], total),
+        'UF': aleatorio.choice(['SP', 'MG', 'RS', 'PR'], total),
+        'Segmento': [', '.join(aleatorio.choice(segmentos, aleatorio.integers(1, 4), replace=False)) for _ in range(total)],
+        'Latitude': aleatorio.uniform(-30, -5, total),
+        'Longitude': aleatorio.uniform(-60, -40, total),
+    })
+
+
+def _assert_iguais(cubo, esperado):
+    for meses, ufs in SELECOES:
+        assert cubo.total(meses, ufs) == esperado.total(meses, ufs)
+        pd.testing.assert_frame_equal(cubo.por_mes_uf(meses, ufs), esperado.por_mes_uf(meses, ufs))
+        pd.testing.assert_series_equal(
+            cubo.top_segmentos(meses, ufs, n=100).sort_index(), esperado.top_segmentos(meses, ufs, n=100).sort_index()
+        )
+        pd.testing.assert_frame_equal(
+            cubo.agregados_uf(meses, ufs).sort_values('UF', ignore_index=True),
+            esperado.agregados_uf(meses, ufs).sort_values('UF', ignore_index=True),
+        )
+
+
+def test_contagens_iguais_as_do_dataframe():
+    df = _catalogo(300, 0)
+    cubo = CuboContagens.a_partir_de(df)
+    assert cubo.total() == 300
+    assert cubo.total(('Março',), ('SP',)) == int(((df['Mes'] == 'Março') & (df['UF'] == 'SP')).sum())
+    pares = df['Segmento'].str.split(', ').explode()
+    assert cubo.top_segmentos(n=100).to_dict() == pares.value_counts().to_dict()
+
+
+@pytest.mark.parametrize("alteracao", ["adicionar", "remover", "modificar", "tudo"])
+def test_atualizado_igual_a_construcao_nova(alteracao):
+    anterior = _catalogo(400, 1)
+    novo = anterior.copy()
+    if alteracao in ("remover", "tudo"):
+        novo = novo.drop(novo.index[::7])
+    if alteracao in ("modificar", "tudo"):
+        linhas = novo.index[::5]
+        novo.loc[linhas, 'Mes'] = 'Dezembro'
+        novo.loc[linhas[::2], 'Segmento'] = 'Fruticultura, Café'
+        novo.loc[linhas[1::2], 'Latitude'] += 1.5
+    if alteracao in ("adicionar", "tudo"):
+        # Com valores que o cubo anterior não tinha (UF, mês e segmento novos)
+        extra = _catalogo(50, 2).assign(UF='AM', Segmento='Aquicultura')
+        novo = pd.concat([novo, extra], ignore_index=True)
+    cubo = CuboContagens.a_partir_de(anterior).atualizado(anterior, novo)
+    _assert_iguais(cubo, CuboContagens.a_partir_de(novo))
+
+
+def test_atualizado_nao_altera_o_cubo_anterior():
+    anterior = _catalogo(100, 3)
+    cubo = CuboContagens.a_partir_de(anterior)
+    eventos = cubo.eventos.copy()
+    cubo.atualizado(anterior, anterior.iloc[:10].assign(UF='AC'))
+    assert np.array_equal(cubo.eventos, eventos)
+    assert 'AC' not in cubo.ufs
+
+
+def test_atualizado_sem_eventos_volta_a_zero():
+    anterior = _catalogo(100, 4)
+    cubo = CuboContagens.a_partir_de(anterior).atualizado(anterior, anterior.iloc[:0])
+    assert cubo.total() == 0
+    assert not cubo.soma_latitude.any() and not cubo.soma_longitude.any()
+    assert cubo.agregados_uf().empty
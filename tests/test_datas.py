@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datas import IndiceIntervalos, interpretar_datas
+
+
+def _interpretar(mes, nome, datas):
+    return interpretar_datas(pd.DataFrame({'Mes': [mes], 'Nome': [nome], 'Datas': [datas]})).iloc[0]
+
+
+@pytest.mark.parametrize("mes, nome, datas, inicio, fim", [
+    ("Janeiro", "Feira 2026", "14", "2026-01-14", "2026-01-14"),
+    ("Janeiro", "Feira 2026", "14 a 16", "2026-01-14", "2026-01-16"),
+    ("Janeiro", "Feira 2026", "28 e 29", "2026-01-28", "2026-01-29"),
+    ("Julho", "Feira 2025", "28 de julho", "2025-07-28", "2025-07-28"),
+    ("Julho", "Feira 2025", "02 a 11 de julho", "2025-07-02", "2025-07-11"),
+    # Mês final em número ou por extenso
+    ("Abril", "Feira 2026", "28 a 03/05", "2026-04-28", "2026-05-03"),
+    ("Agosto", "Feira 2025", "30 de agosto a 07 de setembro", "2025-08-30", "2025-09-07"),
+    # Dia final menor que o inicial: vira o mês e, em dezembro, o ano
+    ("Maio", "Feira 2026", "30 a 02", "2026-05-30", "2026-06-02"),
+    ("Dezembro", "Feira 2025", "30 a 02", "2025-12-30", "2026-01-02"),
+    ("Dezembro", "Feira 2025", "28 de dezembro a 03 de janeiro", "2025-12-28", "2026-01-03"),
+    ("Março", "Feira 2026", " 05  a  07 ", "2026-03-05", "2026-03-07"),
+])
+def test_formatos_reconhecidos(mes, nome, datas, inicio, fim):
+    linha = _interpretar(mes, nome, datas)
+    assert linha['data_valida']
+    assert linha['inicio'] == pd.Timestamp(inicio)
+    assert linha['fim'] == pd.Timestamp(fim)
+
+
+@pytest.mark.parametrize("datas", ["", None, "a confirmar", "14 a", "14/03", "40", "31 de fevereiro"])
+def test_datas_invalidas_ou_vazias(datas):
+    linha = _interpretar("Fevereiro", "Feira 2026", datas)
+    assert not linha['data_valida']
+    assert pd.isna(linha['inicio']) and pd.isna(linha['fim'])
+
+
+def test_ano_em_falta_vem_do_mes():
+    df = pd.DataFrame({
+        'Mes': ['Março', 'Março', 'Março', 'Abril'],
+        'Nome': ['Feira A 2027', 'Feira B 2027', 'Feira C', 'Feira D'],
+        'Datas': ['01', '02', '10', '12'],
+    })
+    interpretar_datas(df)
+    # O mais frequente em março; abril, sem nenhum, herda do mês anterior
+    assert df['inicio'].tolist() == [pd.Timestamp(d) for d in ('2027-03-01', '2027-03-02', '2027-03-10', '2027-04-12')]
+
+
+def _indice(intervalos):
+    inicio, fim = zip(*intervalos)
+    return IndiceIntervalos(np.arange(len(intervalos)), pd.to_datetime(list(inicio)).to_numpy(), pd.to_datetime(list(fim)).to_numpy())
+
+
+def test_sobrepostos_inclui_os_limites():
+    indice = _indice([("2026-03-01", "2026-03-05"), ("2026-03-05", "2026-03-05"), ("2026-03-06", "2026-03-10")])
+    assert sorted(indice.sobrepostos("2026-03-05", "2026-03-05")) == [0, 1]
+    assert sorted(indice.sobrepostos("2026-03-05", "2026-03-06")) == [0, 1, 2]
+    assert sorted(indice.sobrepostos("2026-02-01", "2026-02-28")) == []
+
+
+def test_sobrepostos_sem_fim_e_um_so_dia():
+    # Como o período do dashboard enquanto só o início está escolhido
+    indice = _indice([("2026-03-01", "2026-03-05"), ("2026-03-06", "2026-03-10")])
+    assert sorted(indice.sobrepostos("2026-03-05")) == [0]
+    assert sorted(indice.sobrepostos("2026-03-11")) == []
+
+
+def test_intervalo_longo_que_comeca_antes():
+    # Um evento longo no início não pode esconder-se atrás de eventos curtos posteriores
+    indice = _indice([
+        ("2026-01-01", "2026-12-31"), ("2026-02-01", "2026-02-02"), ("2026-03-01", "2026-03-02"), ("2026-06-01", "2026-06-02"),
+    ])
+    assert sorted(indice.sobrepostos("2026-05-01", "2026-05-31")) == [0]
+    assert sorted(indice.sobrepostos("2026-06-02", "2027-01-01")) == [0, 3]
+
+
+def test_datas_invalidas_ficam_fora_do_indice():
+    indice = _indice([("2026-03-01", "2026-03-05"), (None, None), ("2026-03-02", None)])
+    assert sorted(indice.sobrepostos("2020-01-01", "2030-12-31")) == [0]
+
+
+def test_igual_a_pesquisa_linear():
+    aleatorio = np.random.default_rng(0)
+    inicio = np.datetime64('2026-01-01') + aleatorio.integers(0, 365, 500).astype('timedelta64[D]')
+    fim = inicio + aleatorio.integers(0, 40, 500).astype('timedelta64[D]')
+    indice = IndiceIntervalos(np.arange(500), inicio, fim)
+    for _ in range(50):
+        a = np.datetime64('2026-01-01') + aleatorio.integers(0, 400).astype('timedelta64[D]')
+        b = a + aleatorio.integers(0, 30).astype('timedelta64[D]')
+        esperado = np.flatnonzero((inicio <= b) & (fim >= a))
+        assert sorted(indice.sobrepostos(a, b)) == esperado.tolist()
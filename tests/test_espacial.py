@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from espacial import IndiceEspacial, haversine_km
+
+
+@pytest.fixture
+def pontos():
+    gerador = np.random.default_rng(7)
+    latitudes = gerador.uniform(-34.0, 6.0, 2000)
+    longitudes = gerador.uniform(-74.0, -34.0, 2000)
+    return latitudes, longitudes, gerador.random(2000) < 0.3
+
+
+def forca_bruta(latitudes, longitudes, latitude, longitude, mascara=None):
+    distancias = haversine_km(latitude, longitude, latitudes, longitudes)
+    if mascara is not None:
+        distancias = np.where(mascara, distancias, np.inf)
+    ordem = np.argsort(distancias, kind='stable')
+    return ordem, distancias[ordem]
+
+
+# Pontos no interior, no canto de uma célula e no limite da grelha, com raios que atravessam várias células
+CONSULTAS = [(-15.5, -47.5, 80.0), (-15.0, -47.0, 150.0), (-23.0, -51.0, 600.0), (-33.9, -73.9, 250.0), (0.0, -50.0, 1.0)]
+
+
+@pytest.mark.parametrize("tamanho_celula", [0.5, 1.0, 3.0])
+@pytest.mark.parametrize("com_mascara", [False, True])
+@pytest.mark.parametrize("latitude, longitude, raio_km", CONSULTAS)
+def test_no_raio_igual_a_forca_bruta(pontos, tamanho_celula, com_mascara, latitude, longitude, raio_km):
+    latitudes, longitudes, mascara = pontos
+    mascara = mascara if com_mascara else None
+    indice = IndiceEspacial(latitudes, longitudes, tamanho_celula)
+
+    posicoes, distancias = indice.no_raio(latitude, longitude, raio_km, mascara)
+
+    ordem, esperadas = forca_bruta(latitudes, longitudes, latitude, longitude, mascara)
+    dentro = esperadas <= raio_km
+    assert sorted(posicoes.tolist()) == sorted(ordem[dentro].tolist())
+    np.testing.assert_allclose(distancias, esperadas[dentro])
+    assert np.all(np.diff(distancias) >= 0)
+
+
+@pytest.mark.parametrize("tamanho_celula", [0.5, 1.0, 3.0])
+@pytest.mark.parametrize("com_mascara", [False, True])
+@pytest.mark.parametrize("k", [1, 5, 50])
+def test_mais_proximos_igual_a_forca_bruta(pontos, tamanho_celula, com_mascara, k):
+    latitudes, longitudes, mascara = pontos
+    mascara = mascara if com_mascara else None
+    indice = IndiceEspacial(latitudes, longitudes, tamanho_celula)
+
+    for latitude, longitude, _ in CONSULTAS:
+        posicoes, distancias = indice.mais_proximos(latitude, longitude, k, mascara)
+
+        ordem, esperadas = forca_bruta(latitudes, longitudes, latitude, longitude, mascara)
+        assert posicoes.tolist() == ordem[:k].tolist()
+        np.testing.assert_allclose(distancias, esperadas[:k])
+
+
+@pytest.mark.parametrize("com_mascara", [False, True])
+def test_mais_proximos_com_k_maior_que_os_disponiveis(pontos, com_mascara):
+    latitudes, longitudes, mascara = pontos
+    latitudes, longitudes, mascara = latitudes[:40], longitudes[:40], mascara[:40]
+    mascara = mascara if com_mascara else None
+    disponiveis = len(latitudes) if mascara is None else int(mascara.sum())
+    indice = IndiceEspacial(latitudes, longitudes)
+
+    posicoes, distancias = indice.mais_proximos(-15.0, -47.0, disponiveis + 10, mascara)
+
+    ordem, esperadas = forca_bruta(latitudes, longitudes, -15.0, -47.0, mascara)
+    assert posicoes.tolist() == ordem[:disponiveis].tolist()
+    np.testing.assert_allclose(distancias, esperadas[:disponiveis])
+
+
+def test_mais_proximos_sem_pontos_disponiveis(pontos):
+    latitudes, longitudes, _ = pontos
+    indice = IndiceEspacial(latitudes, longitudes)
+
+    posicoes, distancias = indice.mais_proximos(-15.0, -47.0, 3, np.zeros(len(latitudes), dtype=bool))
+
+    assert len(posicoes) == 0 and len(distancias) == 0
+
+
+def test_de_arrays_responde_como_o_original(pontos):
+    latitudes, longitudes, mascara = pontos
+    indice = IndiceEspacial(latitudes, longitudes, 0.5)
+    copia = IndiceEspacial.de_arrays(indice.para_arrays())
+
+    for latitude, longitude, raio_km in CONSULTAS:
+        assert np.array_equal(indice.no_raio(latitude, longitude, raio_km, mascara)[0],
+                              copia.no_raio(latitude, longitude, raio_km, mascara)[0])
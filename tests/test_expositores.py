@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+from expositores import ExpositoresStore, normalizar_nome
+
+NOMES = ["Agro 100% Ltda", "Agro 1000 Ltda", "Sementes_Sul", "Sementes Sul", "Nutrição Animal", "Máquinas, Peças & Cia"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ExpositoresStore(str(tmp_path / "expositores.sqlite"))
+    store.importar("feira.json", [{'evento': 'Feira', 'evento_id': 'f1', 'nome': nome, 'segmento': ['Agro']} for nome in NOMES])
+    return store
+
+
+@pytest.mark.parametrize("pesquisa, esperados", [
+    ("100%", ["Agro 100% Ltda"]),
+    ("%", ["Agro 100% Ltda"]),
+    ("s_s", ["Sementes_Sul"]),
+    ("_", ["Sementes_Sul"]),
+    ("NUTRICAO", ["Nutrição Animal"]),
+    ("  máquinas,   peças ", ["Máquinas, Peças & Cia"]),
+    ("agro 1", ["Agro 100% Ltda", "Agro 1000 Ltda"]),
+    ("\\", []),
+])
+def test_pesquisa_literal(store, pesquisa, esperados):
+    assert sorted(expositor['nome'] for expositor in store.listar('f1', pesquisa)) == sorted(esperados)
+    assert store.contar('f1', pesquisa) == len(esperados)
+
+
+def test_normalizar_nome():
+    assert normalizar_nome("  Ração\tÁgil  S.A. ") == "racao agil s.a."
+    assert normalizar_nome("Máquinas,Peças") == "maquinas,pecas"
+
+
+def test_base_antiga_e_recalculada(tmp_path):
+    caminho = str(tmp_path / "expositores.sqlite")
+    ExpositoresStore(caminho).importar("feira.json", [{'evento': 'Feira', 'evento_id': 'f1', 'nome': 'Máquinas,Peças'}])
+    with sqlite3.connect(caminho) as conexao:
+        # Como uma base gravada antes da versão 1, com o nome na forma de localização
+        conexao.execute("UPDATE expositores SET nome_busca = 'maquinas, pecas'")
+        conexao.execute("PRAGMA user_version = 0")
+    assert ExpositoresStore(caminho).contar('f1', 'maquinas,pecas') == 1
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import Counter, namedtuple
+
+import pandas as pd
+import pytest
+
+from geocodificacao import GeocodeCache, GeocodificacaoEmFundo, geocodificar_dataframe, normalizar_localizacao
+
+Coordenadas = namedtuple("Coordenadas", "latitude longitude")
+
+
+class GeocodificadorLento:
+    """Responde só depois de `liberar`, registando cada consulta e o instante em que foi feita."""
+
+    def __init__(self):
+        self.consultas = Counter()
+        self.instantes = []
+        self.liberar = threading.Event()
+        self._lock = threading.Lock()
+
+    def geocode(self, localizacao, timeout=None):
+        with self._lock:
+            self.consultas[localizacao] += 1
+            self.instantes.append(time.monotonic())
+        self.liberar.wait(5)
+        return Coordenadas(-15.0, -47.0)
+
+
+class GazetteerVazio:
+    def geocodificar_varios(self, localizacoes):
+        return {}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(str(tmp_path / "geocode.sqlite"))
+
+
+def test_pendentes_em_curso_nao_sao_pedidas_de_novo(cache):
+    geolocator = GeocodificadorLento()
+    servico = GeocodificacaoEmFundo(geolocator, cache, taxa=1e9)
+
+    primeiro = servico.pedir(("Cidade A", "Cidade B", "Cidade C"))
+    # Reconstrução seguinte: parte das pendentes já saiu do conjunto e surge uma nova
+    segundo = servico.pedir(("Cidade B", "Cidade C", "Cidade D"))
+    geolocator.liberar.set()
+    primeiro.aguardar(5)
+    segundo.aguardar(5)
+
+    assert all(total == 1 for total in geolocator.consultas.values())
+    assert sorted(geolocator.consultas) == ["Cidade A", "Cidade B", "Cidade C", "Cidade D"]
+    assert sorted(segundo.resultados()) == ["Cidade B", "Cidade C", "Cidade D"]
+    assert segundo.concluido
+    assert segundo.relatorio()[0] == {"ok": 3, "pendentes": 0}
+
+
+def test_trabalhos_partilham_o_limite_de_pedidos(cache):
+    geolocator = GeocodificadorLento()
+    geolocator.liberar.set()
+    servico = GeocodificacaoEmFundo(geolocator, cache, taxa=20)
+
+    trabalhos = [servico.pedir((f"Cidade {indice}",)) for indice in range(4)]
+    for trabalho in trabalhos:
+        trabalho.aguardar(5)
+
+    instantes = sorted(geolocator.instantes)
+    assert len(instantes) == 4
+    # Com um limite por trabalho, as quatro consultas sairiam todas de imediato
+    assert instantes[-1] - instantes[0] >= 3 / 20 * 0.9
+
+
+def test_cache_lida_antes_do_trabalho_remoto(cache):
+    cache.guardar(normalizar_localizacao("Cidade A"), "Cidade A", (-10.0, -50.0))
+    cache.guardar(normalizar_localizacao("Cidade B"), "Cidade B", None)
+    df = pd.DataFrame({'Localizacao': ["Cidade A", "Cidade B", "Cidade C", "Cidade A"]})
+    pedidas = []
+
+    def remoto(pendentes):
+        pedidas.extend(pendentes)
+        return {}
+
+    nao_resolvidas = geocodificar_dataframe(df, GazetteerVazio(), remoto, cache)
+
+    assert pedidas == ["Cidade C"]
+    assert sorted(nao_resolvidas) == ["Cidade B", "Cidade C"]
+    assert df['Latitude'].tolist()[::3] == [-10.0, -10.0]
@@ -0,0 +1,98 @@
+import csv
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from dataset import DatasetPreparado
+from filtros import COLUNAS_FILTRO, MotorFiltros
+from gazetteer import Gazetteer
+from geocodificacao import geocodificar_dataframe
+from ingestao import CatalogoEventos
+from snapshot import carregar_snapshot, escrever_snapshot
+
+EVENTOS = [
+    ("Março", "Agrishow 2026", "Máquinas, Tecnologia", "27 a 01/05", "Ribeirão Preto", "SP"),
+    ("Março", "Show Rural 2026", "Agronegócio", "09 a 13", "Cascavel", "PR"),
+    ("Abril", "Tecnoshow 2026", "Agronegócio, Máquinas", "06 a 10", "Rio Verde", "GO"),
+    ("Abril", "Feira Sem Cidade 2026", "Café", "15", "Cidade Que Não Existe", "MG"),
+    ("Maio", "Bahia Farm Show 2026", "Tecnologia", "a confirmar", "Luís Eduardo Magalhães", "BA"),
+    ("Setembro", "Expointer 2026", "Pecuária, Agricultura Familiar", "29 de agosto a 06 de setembro", "Esteio", "RS"),
+    ("Setembro", "Expointer 2026", "Pecuária", "29 de agosto a 06 de setembro", "Esteio", "RS"),
+]
+
+
+@pytest.fixture
+def catalogo(tmp_path):
+    diretorio = tmp_path / "eventos"
+    diretorio.mkdir()
+    with open(diretorio / "eventos.csv", "w", encoding="utf-8", newline="") as ficheiro:
+        escritor = csv.writer(ficheiro)
+        escritor.writerow(["Mês", "Evento", "Foco", "Data", "Cidade", "UF"])
+        escritor.writerows(EVENTOS)
+    catalogo = CatalogoEventos(str(diretorio))
+    df = catalogo.atualizar()
+    nao_resolvidas = geocodificar_dataframe(df, Gazetteer())
+    return catalogo, df, nao_resolvidas
+
+
+def test_motor_filtros_ida_e_volta(catalogo, tmp_path):
+    catalogo, df, nao_resolvidas = catalogo
+    destino = str(tmp_path / "snapshot")
+    escrever_snapshot(df, catalogo.hashes(), nao_resolvidas=nao_resolvidas, diretorio=destino)
+    df_catalogo, dataset, manifesto = carregar_snapshot(catalogo.hashes(), destino)
+
+    assert manifesto['nao_resolvidas'] == ["Cidade Que Não Existe, MG"]
+    assert len(df_catalogo) == len(EVENTOS) and len(dataset.df) == len(EVENTOS) - 1
+    motor, novo = dataset.motor_filtros, MotorFiltros(dataset.df)
+    assert motor.para_arrays().keys() == novo.para_arrays().keys()
+    for coluna in COLUNAS_FILTRO:
+        assert motor.valores(coluna) == novo.valores(coluna)
+        for valor in novo.valores(coluna):
+            assert np.array_equal(motor.mascara({coluna: [valor]}), novo.mascara({coluna: [valor]}))
+    selecoes = {'Mes': ['Março', 'Setembro'], 'Segmento': ['Máquinas', 'Pecuária']}
+    assert np.array_equal(motor.posicoes(motor.mascara(selecoes)), novo.posicoes(novo.mascara(selecoes)))
+    assert all(motor.posicao_de(evento_id) == novo.posicao_de(evento_id) for evento_id in dataset.df['evento_id'])
+
+
+def test_filtros_iguais_aos_de_uma_construcao_nova(catalogo, tmp_path):
+    catalogo, df, nao_resolvidas = catalogo
+    destino = str(tmp_path / "snapshot")
+    escrever_snapshot(df, catalogo.hashes(), nao_resolvidas=nao_resolvidas, diretorio=destino)
+    _, dataset, _ = carregar_snapshot(catalogo.hashes(), destino)
+    novo = DatasetPreparado(dataset.df)
+    assert dataset.versao == novo.versao
+    consultas = [
+        ({},),
+        ({'UF': ['RS', 'SP']},),
+        ({}, (np.datetime64('2026-04-30'), np.datetime64('2026-05-02'))),
+        ({'Segmento': ['Agronegócio']}, (), (-24.0, -50.0), 600),
+        ({}, (), (-29.85, -51.18), None, 2),
+    ]
+    for consulta in consultas:
+        assert dataset.filtrar(*consulta).index.tolist() == novo.filtrar(*consulta).index.tolist()
+    assert dataset.cubo.por_mes_uf().equals(novo.cubo.por_mes_uf())
+
+
+def test_carregar_nao_recalcula_a_versao(catalogo, tmp_path, monkeypatch):
+    catalogo, df, nao_resolvidas = catalogo
+    destino = str(tmp_path / "snapshot")
+    escrever_snapshot(df, catalogo.hashes(), nao_resolvidas=nao_resolvidas, diretorio=destino)
+
+    def proibido(*args, **kwargs):
+        raise AssertionError("hash_pandas_object chamado ao carregar o snapshot")
+
+    monkeypatch.setattr("pandas.util.hash_pandas_object", proibido)
+    _, dataset, manifesto = carregar_snapshot(catalogo.hashes(), destino)
+    assert dataset.versao == manifesto['versao_dados']
+
+
+def test_snapshot_de_outros_ficheiros_e_ignorado(catalogo, tmp_path):
+    catalogo, df, _ = catalogo
+    destino = str(tmp_path / "snapshot")
+    escrever_snapshot(df, catalogo.hashes(), diretorio=destino)
+    assert carregar_snapshot({"eventos.csv": "outro hash"}, destino) is None
+    assert carregar_snapshot(catalogo.hashes(), str(tmp_path / "vazio")) is None
+    assert os.path.exists(os.path.join(destino, "ATUAL"))